@@ -1,29 +1,82 @@
 """Python Coding Agent - A minimal coding assistant using LangGraph and OpenRouter."""
 
+import importlib
+import os
+from typing import TYPE_CHECKING
+
 __version__ = "2.0.1"
 
-# High-level API (recommended for most users)
-from agentic_python_coder.runner import solve_task
+# Public names and the modules defining them. They are imported on first
+# access, so that importing a submodule does not load LangGraph.
+_EXPORTS = {
+    # High-level API (recommended for most users)
+    "solve_task": "runner",
+    "solve_task_async": "runner",
+    "solve_tasks": "runner",
+    "solve_tasks_async": "runner",
+    # Lower-level API (for custom workflows)
+    "create_coding_agent": "agent",
+    "run_agent": "agent",
+    "run_agent_async": "agent",
+    "get_final_response": "agent",
+    "DEFAULT_STEP_LIMIT": "agent",
+    # LLM utilities
+    "get_openrouter_llm": "llm",
+    "MODEL_REGISTRY": "llm",
+    "MODEL_STRING": "llm",
+}
+
+if TYPE_CHECKING:
+    from agentic_python_coder.runner import (
+        solve_task,
+        solve_task_async,
+        solve_tasks,
+        solve_tasks_async,
+    )
+    from agentic_python_coder.agent import (
+        create_coding_agent,
+        run_agent,
+        run_agent_async,
+        get_final_response,
+        DEFAULT_STEP_LIMIT,
+    )
+    from agentic_python_coder.llm import (
+        get_openrouter_llm,
+        MODEL_REGISTRY,
+        MODEL_STRING,
+    )
+
+
+# The kernel module starts the prewarm thread when it is imported
+if os.environ.get("CODER_PREWARM_KERNEL") == "1":
+    importlib.import_module(f"{__name__}.kernel")
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
 
-# Lower-level API (for custom workflows)
-from agentic_python_coder.agent import (
-    create_coding_agent,
-    run_agent,
-    get_final_response,
-    DEFAULT_STEP_LIMIT,
-)
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
 
-# LLM utilities
-from agentic_python_coder.llm import get_openrouter_llm, MODEL_REGISTRY, MODEL_STRING
 
 __all__ = [
     # Version
     "__version__",
     # High-level
     "solve_task",
+    "solve_task_async",
+    "solve_tasks",
+    "solve_tasks_async",
     # Low-level
     "create_coding_agent",
     "run_agent",
+    "run_agent_async",
     "get_final_response",
     "DEFAULT_STEP_LIMIT",
     # LLM
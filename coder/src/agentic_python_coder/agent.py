@@ -1,11 +1,26 @@
 """ReAct agent for Python coding tasks."""
 
-from typing import Dict, Any, List, Optional
+import asyncio
+import functools
+import hashlib
+import json
+import re
+import reprlib
+import sys
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, Iterator, List, Optional
 from pathlib import Path
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import InMemorySaver
 
 from agentic_python_coder.llm import get_openrouter_llm
+from agentic_python_coder.runner import run_sync
 from agentic_python_coder.tools import (
     todo_write,
     python_exec,
@@ -13,18 +28,237 @@ from agentic_python_coder.tools import (
     report_issue,
     working_dir,
     set_task_basename,
+    set_with_packages,
     reset_global_state,
 )
 
+try:
+    # Faster parsing of large tool call arguments (optional "fast" extra)
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 # Default maximum number of steps the agent can take before stopping
 DEFAULT_STEP_LIMIT = 200
 
+# Code features used to describe python_exec calls, found in a single scan
+_CODE_HINTS_RE = re.compile(
+    r"def (?P<def>[^(]*)"
+    r"|class (?P<cls>[^(:]*)"
+    r"|(?P<read>read_(?:csv|excel|json))"
+    r"|(?P<write>to_(?:csv|excel|json))"
+    r"|(?P<plot>plt\.|plot)"
+    r"|(?P<agg>groupby|aggregate)"
+)
+
+
+# Bounded repr for argument previews; starts like str(args) without
+# rendering large values (e.g. the code passed to save_code) in full
+_ARGS_REPR = reprlib.Repr()
+_ARGS_REPR.maxstring = _ARGS_REPR.maxother = 80
+_ARGS_REPR.maxdict = _ARGS_REPR.maxlist = _ARGS_REPR.maxtuple = 16
+
+
+# First turns from this size on (about 1000 tokens) get a cache breakpoint
+_CACHED_TURN_MIN_CHARS = 4000
+
+
+def _normalize_newlines(text: str) -> str:
+    """Strip a BOM and convert CRLF and CR line endings to LF."""
+    return text.removeprefix("\ufeff").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _canonicalize(text: str) -> str:
+    """Normalize static prompt text so equal prompts are byte-identical.
+
+    Provider prompt caches match on exact prefixes, so a BOM, CRLF line
+    endings, trailing whitespace or a different Unicode normal form from
+    the way a file was saved would otherwise cause cache misses. Task text
+    is not part of the shared prefix and only gets _normalize_newlines().
+    """
+    return unicodedata.normalize("NFC", _normalize_newlines(text)).rstrip()
+
+
+@dataclass(slots=True)
+class RunStats:
+    """Statistics accumulated while running the agent."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    execution_time_seconds: float = 0.0
+    tool_usage: Counter = field(default_factory=Counter)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Convert to the statistics dictionary returned by run_agent."""
+        return {
+            "tool_usage": dict(self.tool_usage),
+            "token_consumption": {
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": self.total_tokens,
+            },
+            "execution_time_seconds": self.execution_time_seconds,
+        }
+
+
+@functools.lru_cache(maxsize=16)
+def _read_prompt(path: str, mtime_ns: int) -> str:
+    """Read and canonicalize a prompt file; cached per file version."""
+    return _canonicalize(Path(path).read_text())
+
 
 def load_prompt(prompt_path: Path) -> str:
-    """Load a prompt from file."""
-    if not prompt_path.exists():
-        raise FileNotFoundError(f"Prompt file not found: {prompt_path}")
-    return prompt_path.read_text()
+    """Load a prompt from file, reading it again only after it changed."""
+    try:
+        mtime_ns = prompt_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Prompt file not found: {prompt_path}") from None
+    return _read_prompt(str(prompt_path.resolve()), mtime_ns)
+
+
+@functools.lru_cache(maxsize=16)
+def _static_prompt(system_prompt: str, project_prompt: Optional[str]) -> str:
+    """Join the canonical system and project prompts; cached per prompt pair."""
+    prompts = [_canonicalize(system_prompt)]
+    if project_prompt:
+        prompts.append(_canonicalize(project_prompt))
+    return "\n\n".join(prompts)
+
+
+def _trim_history(messages: list, max_tokens: int) -> list:
+    """Keep the first user turn and as many recent messages as fit the budget.
+
+    The tail starts on an AI message so that no tool result is sent without
+    the tool call it answers. Token counts are estimated from message sizes.
+    The newest user message, or the newest AI message with its tool results,
+    is always kept, even if it alone exceeds the budget.
+    """
+    if len(messages) <= 1 or count_tokens_approximately(messages) <= max_tokens:
+        return messages
+
+    head = messages[:1]
+    tail = trim_messages(
+        messages[1:],
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        max_tokens=max(max_tokens - count_tokens_approximately(head), 0),
+        start_on="ai",
+    )
+
+    # The newest turn starts at the last message that is not a tool result
+    newest = len(messages) - 1
+    while newest > 1 and isinstance(messages[newest], ToolMessage):
+        newest -= 1
+    if len(tail) < len(messages) - newest:
+        tail = messages[newest:]
+    return head + tail
+
+
+def _agent_prompt(state: dict, config: RunnableConfig) -> list:
+    """Prepend the agent's system message and put the task into the first turn.
+
+    Both are carried in the run config. The task stays out of the system
+    message so that it is the same for every task with the same system and
+    project prompt, which keeps provider prefix caches warm across tasks.
+    The history is trimmed to the agent's token budget, if it has one; the
+    checkpointed history itself is left complete. For Anthropic models a
+    long first turn is marked cacheable like the system message.
+    """
+    configurable = config["configurable"]
+    messages = state["messages"]
+    max_history_tokens = configurable.get("coder_max_history_tokens")
+    if max_history_tokens:
+        messages = _trim_history(messages, max_history_tokens)
+    if messages and isinstance(messages[0].content, str):
+        first = messages[0]
+        content = first.content
+        task_block = configurable.get("coder_task_block")
+        if task_block:
+            content = f"{task_block}\n\n{content}"
+        if (
+            configurable.get("coder_cache_first_turn")
+            and len(content) >= _CACHED_TURN_MIN_CHARS
+        ):
+            # Resent with every step; a second breakpoint caches it as well
+            content = [
+                {
+                    "type": "text",
+                    "text": content,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ]
+        if content is not first.content:
+            messages = [first.model_copy(update={"content": content})] + messages[1:]
+    return [configurable["coder_system_message"]] + messages
+
+
+class LatestCheckpointSaver(InMemorySaver):
+    """In-memory checkpointer keeping only the latest checkpoint per thread.
+
+    Agents continue a conversation from its latest checkpoint and never
+    load older ones, but every checkpoint holds a full copy of the message
+    list, so keeping them all costs memory quadratic in the run length.
+    """
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = next_config["configurable"]["thread_id"]
+        checkpoint_ns = next_config["configurable"]["checkpoint_ns"]
+
+        # Drop the older checkpoints of the thread with their pending writes
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in [c for c in checkpoints if c != checkpoint["id"]]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        # Drop channel values the latest checkpoint does not refer to
+        versions = checkpoint["channel_versions"]
+        stale = [
+            key
+            for key in self.blobs
+            if key[0] == thread_id
+            and key[1] == checkpoint_ns
+            and versions.get(key[2]) != key[3]
+        ]
+        for key in stale:
+            del self.blobs[key]
+
+        return next_config
+
+
+@functools.lru_cache(maxsize=8)
+def _compile_agent(
+    model: str,
+    api_key: Optional[str],
+    todo: bool,
+    verbose: bool,
+    prompt_cache_key: Optional[str] = None,
+):
+    """Build the LLM and compile the ReAct graph for a given configuration.
+
+    The graph holds no per-task state: the system message is read from the
+    run config and each agent gets its own checkpointer, so one compiled
+    graph is shared by every agent with the same model, tool set and
+    static prompt.
+
+    Returns:
+        Tuple of (resolved model path, compiled graph without checkpointer)
+    """
+    llm = get_openrouter_llm(
+        model=model,
+        api_key=api_key,
+        verbose=verbose,
+        prompt_cache_key=prompt_cache_key,
+    )
+
+    # Minimal tool set
+    if todo:
+        tools = [python_exec, save_code, report_issue, todo_write]
+    else:
+        tools = [python_exec, save_code, report_issue]
+
+    return llm.model_name, create_react_agent(llm, tools, prompt=_agent_prompt)
 
 
 def create_coding_agent(
@@ -39,6 +273,7 @@ def create_coding_agent(
     api_key: Optional[str] = None,
     todo: bool = False,
     verbose: bool = False,
+    max_history_tokens: Optional[int] = None,
 ):
     """Create a ReAct agent for Python coding tasks.
 
@@ -54,6 +289,9 @@ def create_coding_agent(
         api_key: Optional API key override
         todo: If True, includes todo_write tool for task tracking
         verbose: If True, print progress info (default False for library use)
+        max_history_tokens: Approximate token budget for the conversation
+            history sent to the LLM; older steps are dropped beyond it
+            (default: send the full history)
 
     Returns:
         Configured LangGraph agent with metadata
@@ -65,52 +303,53 @@ def create_coding_agent(
     if task_basename:
         set_task_basename(task_basename)
 
-    # Store packages for kernel initialization
-    if with_packages is not None:
-        import os
-
-        os.environ["CODER_WITH_PACKAGES"] = ",".join(with_packages)
-
-    # Get LLM instance
-    llm = get_openrouter_llm(
-        model=model or "default",
-        api_key=api_key,
-        verbose=verbose,
-    )
-
-    # Minimal tool set
-    if todo:
-        tools = [python_exec, save_code, report_issue, todo_write]
-    else:
-        tools = [python_exec, save_code, report_issue]
-
-    # Build combined prompt
-    prompts = []
-
+    # Build the static prompt (system + project); the task goes into the first turn
     # System prompt: string takes precedence over path
-    if system_prompt:
-        prompts.append(system_prompt)
-    elif system_prompt_path:
-        prompts.append(load_prompt(Path(system_prompt_path)))
-    else:
-        prompts.append(
-            "You are a Python coding assistant with file and execution tools."
-        )
-
-    # Project prompt
-    if project_prompt:
-        prompts.append(project_prompt)
+    if not system_prompt:
+        if system_prompt_path:
+            system_prompt = load_prompt(Path(system_prompt_path))
+        else:
+            system_prompt = (
+                "You are a Python coding assistant with file and execution tools."
+            )
+    static_prompt = _static_prompt(system_prompt, project_prompt)
 
     # Task content
-    if task_content:
-        prompts.append(f"<task>\n{task_content}\n</task>")
-
-    combined_prompt = "\n\n".join(prompts)
+    task_block = (
+        f"<task>\n{_normalize_newlines(task_content)}\n</task>"
+        if task_content
+        else None
+    )
 
-    # Create the agent with memory
-    checkpointer = InMemorySaver()
-    agent = create_react_agent(
-        llm, tools, prompt=combined_prompt, checkpointer=checkpointer
+    # Let the provider route requests with the same prefix to a warm cache
+    model = model or "default"
+    prompt_cache_key = hashlib.sha1(f"{model}\n{static_prompt}".encode()).hexdigest()
+
+    # Get LLM and compiled graph (shared across agents with the same settings)
+    model_path, graph = _compile_agent(model, api_key, todo, verbose, prompt_cache_key)
+
+    if model_path.startswith("anthropic/"):
+        # Mark the static prompt as cacheable so it is reused across ReAct steps
+        system_message = SystemMessage(
+            content=[
+                {
+                    "type": "text",
+                    "text": static_prompt,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ]
+        )
+    else:
+        system_message = SystemMessage(content=static_prompt)
+
+    # Create the agent with its own memory and system message
+    agent = graph.copy({"checkpointer": LatestCheckpointSaver()}).with_config(
+        configurable={
+            "coder_system_message": system_message,
+            "coder_task_block": task_block,
+            "coder_max_history_tokens": max_history_tokens,
+            "coder_cache_first_turn": model_path.startswith("anthropic/"),
+        }
     )
 
     # Store metadata for run_agent to use
@@ -123,50 +362,60 @@ def create_coding_agent(
     return agent
 
 
+def _first_code_line(code: str) -> str:
+    """Return the first non-empty line of code that is not a comment."""
+    start = 0
+    while start < len(code):
+        end = code.find("\n", start)
+        if end < 0:
+            end = len(code)
+        line = code[start:end].strip()
+        if line and not line.startswith("#"):
+            return line
+        start = end + 1
+    return ""
+
+
+def _describe_code(code: str) -> str:
+    """Summarize python_exec code in a few words for the progress output."""
+    stripped = code.strip()
+    single_line = "\n" not in stripped
+
+    # First occurrence of each hint; priority is applied below
+    hints = {}
+    for match in _CODE_HINTS_RE.finditer(code):
+        hints.setdefault(match.lastgroup, match)
+
+    if "def" in hints:
+        return f"defining function {hints['def'].group('def')}()"
+    if "cls" in hints:
+        return f"defining class {hints['cls'].group('cls')}"
+    if single_line and "import " in code:
+        return stripped
+    if single_line and "=" in code:
+        return f"assigning variable {code.split('=', 1)[0].strip()}"
+    if stripped.startswith("print("):
+        return f"{stripped[:50]}{'...' if len(stripped) > 50 else ''}"
+    if "read" in hints:
+        return "loading data file"
+    if "write" in hints:
+        return "saving data to file"
+    if "plot" in hints:
+        return "creating visualization"
+    if "agg" in hints:
+        return "analyzing/aggregating data"
+
+    # Otherwise show the first line that is not a comment
+    line = _first_code_line(stripped)
+    if line:
+        return f"{line[:50]}{'...' if len(line) > 50 else ''}"
+    return "executing code"
+
+
 def _print_tool_progress(tool_name: str, args: dict):
     """Print progress info for a tool call."""
     if tool_name == "python_exec" and "code" in args:
-        code = args["code"]
-        if "def " in code:
-            func_match = code.split("def ")[1].split("(")[0] if "def " in code else ""
-            print(f"  {tool_name}: defining function {func_match}()")
-        elif "class " in code:
-            class_match = (
-                code.split("class ")[1].split("(")[0].split(":")[0]
-                if "class " in code
-                else ""
-            )
-            print(f"  {tool_name}: defining class {class_match}")
-        elif "import " in code and len(code.strip().split("\n")) == 1:
-            print(f"  {tool_name}: {code.strip()}")
-        elif "=" in code and len(code.strip().split("\n")) == 1:
-            var_name = code.split("=")[0].strip()
-            print(f"  {tool_name}: assigning variable {var_name}")
-        elif code.strip().startswith("print("):
-            print(
-                f"  {tool_name}: {code.strip()[:50]}{'...' if len(code.strip()) > 50 else ''}"
-            )
-        elif "read_csv" in code or "read_excel" in code or "read_json" in code:
-            print(f"  {tool_name}: loading data file")
-        elif "to_csv" in code or "to_excel" in code or "to_json" in code:
-            print(f"  {tool_name}: saving data to file")
-        elif "plt." in code or "plot" in code:
-            print(f"  {tool_name}: creating visualization")
-        elif "groupby" in code or "aggregate" in code:
-            print(f"  {tool_name}: analyzing/aggregating data")
-        else:
-            lines = [
-                line.strip()
-                for line in code.split("\n")
-                if line.strip() and not line.strip().startswith("#")
-            ]
-            if lines:
-                first_line = lines[0][:50]
-                if len(lines[0]) > 50:
-                    first_line += "..."
-                print(f"  {tool_name}: {first_line}")
-            else:
-                print(f"  {tool_name}: executing code")
+        print(f"  {tool_name}: {_describe_code(args['code'])}")
     elif tool_name == "todo_write" and "todos" in args:
         print(f"\n  {tool_name}:")
         todos = args["todos"]
@@ -180,91 +429,108 @@ def _print_tool_progress(tool_name: str, args: dict):
             )
             print(f"     {status_symbol} {todo['content']}")
     else:
-        arg_str = str(args)[:30]
-        if len(str(args)) > 30:
-            arg_str += "..."
-        print(f"  {tool_name}: {arg_str}")
+        arg_str = _ARGS_REPR.repr(args)
+        print(f"  {tool_name}: {arg_str[:30]}{'...' if len(arg_str) > 30 else ''}")
 
 
-def _process_tool_calls(msg, current_tools: dict, stats: dict, quiet: bool):
-    """Process tool calls from a message, updating stats and optionally printing."""
-    if hasattr(msg, "tool_calls") and msg.tool_calls:
-        for tool_call in msg.tool_calls:
+def _iter_tool_calls(msg) -> Iterator[tuple]:
+    """Yield (tool_name, args) for each tool call of a message.
+
+    Parsed tool_calls are preferred; the raw provider tool calls in
+    additional_kwargs are only used when they are absent, so a call
+    reported in both places is seen once. Raw arguments are yielded as the
+    unparsed JSON string.
+    """
+    tool_calls = getattr(msg, "tool_calls", None)
+    if tool_calls:
+        for tool_call in tool_calls:
             tool_name = tool_call.get("name") or tool_call.get("function", {}).get(
                 "name"
             )
-            tool_id = tool_call.get("id")
-            if tool_id:
-                current_tools[tool_id] = tool_name
-
-            if tool_name:
-                stats["tool_usage"][tool_name] = (
-                    stats["tool_usage"].get(tool_name, 0) + 1
-                )
-
-            if not quiet and tool_name:
-                args = tool_call.get("args", {})
-                if isinstance(args, dict):
-                    _print_tool_progress(tool_name, args)
-                else:
-                    print(f"  {tool_name}")
-
-    elif hasattr(msg, "additional_kwargs"):
-        tool_calls = msg.additional_kwargs.get("tool_calls", [])
-        for tool_call in tool_calls:
+            yield tool_name, tool_call.get("args", {})
+        return
+
+    additional_kwargs = getattr(msg, "additional_kwargs", None)
+    if additional_kwargs:
+        for tool_call in additional_kwargs.get("tool_calls", []):
             function = tool_call.get("function", {})
-            tool_name = function.get("name")
-            tool_id = tool_call.get("id")
-            if tool_id and tool_name:
-                current_tools[tool_id] = tool_name
-
-            if tool_name:
-                stats["tool_usage"][tool_name] = (
-                    stats["tool_usage"].get(tool_name, 0) + 1
-                )
-
-            if not quiet and tool_name:
-                args_str = function.get("arguments", "{}")
-                try:
-                    import json
-
-                    args = json.loads(args_str)
-                    _print_tool_progress(tool_name, args)
-                except Exception:
-                    print(f"  {tool_name}")
-
-
-def _update_token_stats(msg, stats: dict):
-    """Extract and update token usage statistics from a message."""
-    if hasattr(msg, "response_metadata"):
-        usage = msg.response_metadata.get("usage", {})
+            yield function.get("name"), function.get("arguments", "{}")
+
+
+def _process_tool_calls(msg, stats: RunStats, quiet: bool):
+    """Process tool calls from a message, updating stats and optionally printing."""
+    for tool_name, args in _iter_tool_calls(msg):
+        if not tool_name:
+            continue
+        stats.tool_usage[tool_name] += 1
+
+        # Nothing below is needed when no progress is shown
+        if quiet:
+            continue
+        if isinstance(args, str):
+            try:
+                args = _json_loads(args)
+            except (TypeError, ValueError):
+                args = None
+        if isinstance(args, dict):
+            _print_tool_progress(tool_name, args)
+        else:
+            print(f"  {tool_name}")
+
+
+def _update_token_stats(msg, stats: RunStats):
+    """Extract and update token usage statistics from a message.
+
+    LangChain's usage_metadata is preferred; the provider's raw usage in
+    response_metadata is only read when it is absent, so a message is
+    counted once.
+    """
+    usage_metadata = getattr(msg, "usage_metadata", None)
+    if usage_metadata:
+        stats.input_tokens += usage_metadata.get("input_tokens", 0)
+        stats.output_tokens += usage_metadata.get("output_tokens", 0)
+        stats.total_tokens += usage_metadata.get("total_tokens", 0)
+        return
+
+    response_metadata = getattr(msg, "response_metadata", None)
+    if response_metadata:
+        usage = response_metadata.get("usage")
         if usage:
-            stats["token_consumption"]["input_tokens"] += usage.get("prompt_tokens", 0)
-            stats["token_consumption"]["output_tokens"] += usage.get(
-                "completion_tokens", 0
-            )
-            stats["token_consumption"]["total_tokens"] += usage.get("total_tokens", 0)
+            stats.input_tokens += usage.get("prompt_tokens", 0)
+            stats.output_tokens += usage.get("completion_tokens", 0)
+            stats.total_tokens += usage.get("total_tokens", 0)
 
-    if hasattr(msg, "usage_metadata") and msg.usage_metadata:
-        stats["token_consumption"]["input_tokens"] += msg.usage_metadata.get(
-            "input_tokens", 0
-        )
-        stats["token_consumption"]["output_tokens"] += msg.usage_metadata.get(
-            "output_tokens", 0
-        )
-        stats["token_consumption"]["total_tokens"] += msg.usage_metadata.get(
-            "total_tokens", 0
-        )
 
+def _handle_message(msg, stats: RunStats, quiet: bool):
+    """Process tool calls (always update stats, optionally print) and tokens."""
+    _process_tool_calls(msg, stats, quiet)
+    _update_token_stats(msg, stats)
 
-def run_agent(
+
+def _skip_message(msg, stats: RunStats, quiet: bool):
+    """Tool results and user input carry neither tool calls nor token usage."""
+
+
+# Per-class message handlers; unknown types fall back to the generic handler
+_MESSAGE_HANDLERS = {
+    AIMessage: _handle_message,
+    ToolMessage: _skip_message,
+    HumanMessage: _skip_message,
+}
+
+
+async def run_agent_async(
     agent,
     user_input: str,
     thread_id: str = "default",
     quiet: bool = False,
     step_limit: Optional[int] = None,
+    on_message: Optional[Callable[[Any], None]] = None,
 ) -> tuple[List[Dict[str, Any]], Dict[str, Any]]:
-    """Run the agent with user input.
+    """Run the agent with user input, streaming asynchronously.
+
+    Tool calls run in worker threads while the event loop keeps reading
+    from the LLM connection.
 
     Args:
         agent: The LangGraph agent (from create_coding_agent)
@@ -272,6 +538,7 @@ def run_agent(
         thread_id: Thread ID for conversation memory
         quiet: If True, suppress all console output (default False)
         step_limit: Maximum agent steps before stopping (default: 200)
+        on_message: Called with each new message as it arrives
 
     Returns:
         Tuple of (List of messages from the agent, Statistics dictionary)
@@ -281,26 +548,20 @@ def run_agent(
     metadata = getattr(agent, "_coder_metadata", {})
     if "working_directory" in metadata:
         working_dir.set(metadata["working_directory"])
+    # Packages of the kernel, likewise per run
+    set_with_packages(metadata.get("with_packages"))
 
     limit = step_limit if step_limit is not None else DEFAULT_STEP_LIMIT
     config = {"configurable": {"thread_id": thread_id}, "recursion_limit": limit}
 
     messages = []
-    current_tools = {}
-
-    # Initialize statistics
-    stats = {
-        "tool_usage": {},
-        "token_consumption": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
-        "execution_time_seconds": 0,
-    }
 
-    import time
+    stats = RunStats()
 
-    start_time = time.time()
+    start_time = time.monotonic()
 
     # Stream the agent's work
-    for chunk in agent.stream(
+    async for chunk in agent.astream(
         {"messages": [{"role": "user", "content": user_input}]},
         config=config,
         stream_mode="updates",
@@ -309,19 +570,59 @@ def run_agent(
             node_name = next(iter(chunk.keys()))
             node_output = chunk[node_name]
 
+            # Each update holds only the messages the node just added
             if "messages" in node_output:
-                for msg in node_output["messages"]:
-                    messages.append(msg)
+                new_messages = node_output["messages"]
+                messages.extend(new_messages)
+                for msg in new_messages:
+                    _MESSAGE_HANDLERS.get(type(msg), _handle_message)(msg, stats, quiet)
+                    if on_message is not None:
+                        on_message(msg)
 
-                    # Process tool calls (always update stats, optionally print)
-                    _process_tool_calls(msg, current_tools, stats, quiet)
+            # Show this step's progress lines with a single write
+            if not quiet:
+                sys.stdout.flush()
+
+    stats.execution_time_seconds = time.monotonic() - start_time
+
+    return messages, stats.as_dict()
+
+
+def run_agent(
+    agent,
+    user_input: str,
+    thread_id: str = "default",
+    quiet: bool = False,
+    step_limit: Optional[int] = None,
+    on_message: Optional[Callable[[Any], None]] = None,
+) -> tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Run the agent with user input.
 
-                    # Update token statistics
-                    _update_token_stats(msg, stats)
+    Synchronous wrapper around run_agent_async. Called from a running event
+    loop, it blocks that loop until the run is done; await run_agent_async
+    there instead to keep the loop responsive.
 
-    stats["execution_time_seconds"] = time.time() - start_time
+    Args:
+        agent: The LangGraph agent (from create_coding_agent)
+        user_input: User's request
+        thread_id: Thread ID for conversation memory
+        quiet: If True, suppress all console output (default False)
+        step_limit: Maximum agent steps before stopping (default: 200)
+        on_message: Called with each new message as it arrives
 
-    return messages, stats
+    Returns:
+        Tuple of (List of messages from the agent, Statistics dictionary)
+    """
+    return run_sync(
+        run_agent_async(
+            agent,
+            user_input,
+            thread_id=thread_id,
+            quiet=quiet,
+            step_limit=step_limit,
+            on_message=on_message,
+        )
+    )
 
 
 def get_final_response(messages: List[Any]) -> Optional[str]:
@@ -334,34 +635,21 @@ def get_final_response(messages: List[Any]) -> Optional[str]:
         The content of the last AI message, or None if not found
     """
     for msg in reversed(messages):
-        # Skip tool call messages
-        has_tool_calls = False
-        if hasattr(msg, "tool_calls") and msg.tool_calls:
-            has_tool_calls = True
-        elif hasattr(msg, "additional_kwargs") and msg.additional_kwargs.get(
-            "tool_calls"
-        ):
-            has_tool_calls = True
+        # Typed messages are the common case; tool call messages are skipped
+        if isinstance(msg, AIMessage):
+            if (
+                msg.content
+                and not msg.tool_calls
+                and not msg.additional_kwargs.get("tool_calls")
+            ):
+                return msg.content
         elif isinstance(msg, dict):
-            if msg.get("tool_calls") or msg.get("additional_kwargs", {}).get(
-                "tool_calls"
+            if (
+                msg.get("content")
+                and (msg.get("type") == "ai" or msg.get("role") == "assistant")
+                and not msg.get("tool_calls")
+                and not msg.get("additional_kwargs", {}).get("tool_calls")
             ):
-                has_tool_calls = True
-
-        if not has_tool_calls:
-            content = None
-            if hasattr(msg, "content") and msg.content:
-                if hasattr(msg, "type") and msg.type == "ai":
-                    content = msg.content
-                elif hasattr(msg, "role") and msg.role == "assistant":
-                    content = msg.content
-            elif isinstance(msg, dict):
-                if msg.get("content") and (
-                    msg.get("type") == "ai" or msg.get("role") == "assistant"
-                ):
-                    content = msg.get("content")
-
-            if content:
-                return content
+                return msg["content"]
 
     return None
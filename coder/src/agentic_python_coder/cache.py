@@ -0,0 +1,169 @@
+"""On-disk response cache for deterministic LLM calls."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+
+# Default location and lifetime of cached responses
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "coder" / "llm"
+DEFAULT_TTL_SECONDS = 1800
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class DiskLLMCache(BaseCache):
+    """LangChain cache storing one JSON file per (model settings, prompt) key.
+
+    LangChain puts the model name, sampling parameters and bound tool schemas
+    into ``llm_string`` and the serialized messages into ``prompt``, so a hit
+    means the provider would be asked exactly the same question again.
+
+    In sampled mode, meant for models with a non-zero temperature, a key
+    holds independent responses to the same request, one file each. The n-th
+    identical request made by this process gets the n-th stored response, and
+    asks the provider once the stored ones are used up. A repeated run thus
+    replays the samples of an earlier one without making them identical
+    to each other. Each sample expires on its own, ``ttl`` after it was stored.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        ttl: int = DEFAULT_TTL_SECONDS,
+        sampled: bool = False,
+    ):
+        """Initialize the cache.
+
+        Args:
+            cache_dir: Directory for cache entries (default: ~/.cache/coder/llm)
+            ttl: Seconds after which an entry is ignored
+            sampled: Keep several responses per request (see above)
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.ttl = ttl
+        self.sampled = sampled
+        # Sampled mode: number of lookups per entry made by this process
+        self._draws: Counter = Counter()
+        self._draws_lock = threading.Lock()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        """Get the file name stem of the entries for a request."""
+        return hashlib.sha256(f"{llm_string}\n{prompt}".encode()).hexdigest()
+
+    def _entry_path(self, key: str, sample: int = 0) -> Path:
+        """Get the file holding the entry (in sampled mode: a sample) of a key."""
+        if self.sampled:
+            return self.cache_dir / f"{key}.{sample}.samples.json"
+        return self.cache_dir / f"{key}.json"
+
+    def _read(self, path: Path) -> Optional[list]:
+        """Read an entry file, or None if it is missing, expired or corrupt."""
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Return cached generations, or None on a miss or expired entry."""
+        key = self._key(prompt, llm_string)
+        draw = 0
+        if self.sampled:
+            with self._draws_lock:
+                draw = self._draws[key]
+                self._draws[key] += 1
+        entries = self._read(self._entry_path(key, draw))
+        if entries is None:
+            return None
+
+        generations = []
+        for entry in entries:
+            message = messages_from_dict([entry["message"]])[0]
+            # A cache hit consumes no provider tokens
+            message.usage_metadata = None
+            generations.append(ChatGeneration(message=message))
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        """Store generations for a key.
+
+        A failed write is logged and ignored; the response is still returned.
+        """
+        entries = [
+            {"message": message_to_dict(gen.message)}
+            for gen in return_val
+            if isinstance(gen, ChatGeneration)
+        ]
+        if not entries:
+            return
+
+        key = self._key(prompt, llm_string)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            if self.sampled:
+                self._add_sample(key, entries)
+            else:
+                self._write(self._entry_path(key), entries)
+        except OSError as e:
+            logger.warning("Could not write LLM cache entry %s: %s", key, e)
+
+    def _add_sample(self, key: str, entries: list):
+        """Store another sample of a key in the first free (or expired) slot.
+
+        Slots are claimed by exclusive file creation, so concurrent writers,
+        also of other processes, never overwrite each other's samples.
+        """
+        sample = 0
+        while True:
+            path = self._entry_path(key, sample)
+            if self._write(path, entries, exclusive=True):
+                return
+            if self._read(path) is None:
+                # The slot's sample expired (or is corrupt): replace it
+                self._write(path, entries)
+                return
+            sample += 1
+
+    def _write(self, path: Path, entries: list, exclusive: bool = False) -> bool:
+        """Write an entry file atomically, so readers never see partial JSON.
+
+        Returns:
+            False if exclusive is set and the file already exists
+        """
+        # A temp file of its own per write: threads may store the same key
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.cache_dir, suffix=".tmp", delete=False
+        ) as tmp:
+            tmp.write(json.dumps(entries))
+        try:
+            if exclusive:
+                # Linking fails instead of replacing an existing file
+                os.link(tmp.name, path)
+            else:
+                os.replace(tmp.name, path)
+        except FileExistsError:
+            return False
+        finally:
+            Path(tmp.name).unlink(missing_ok=True)
+        return True
+
+    def clear(self, **kwargs: Any):
+        """Remove all cached entries."""
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+        with self._draws_lock:
+            self._draws.clear()
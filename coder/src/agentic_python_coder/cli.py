@@ -1,23 +1,24 @@
 """Command-line interface for the Python coding agent."""
 
 import argparse
+import functools
+import json
 import os
 import sys
 import re
 import shutil
+import traceback
+from collections import Counter
 from pathlib import Path
 from typing import Optional, Dict, Any
 from importlib import resources
 
 from agentic_python_coder.runner import (
+    DEFAULT_CONCURRENCY,
     solve_task,
+    solve_tasks,
     get_system_prompt_path,
-    save_conversation_log,
-)
-from agentic_python_coder.agent import (
-    create_coding_agent,
-    run_agent,
-    get_final_response,
+    ConversationLogger,
 )
 from agentic_python_coder.project_md import (
     parse_project_file,
@@ -27,15 +28,26 @@ from agentic_python_coder.project_md import (
 from agentic_python_coder.llm import MODEL_STRING, MODEL_REGISTRY
 from agentic_python_coder import __version__
 
+# Package specification: name, optional [extras], optional version constraint.
+# Each part can be matched in only one way, so matching takes linear time.
+_PKG_RE = re.compile(
+    r"[a-zA-Z0-9](?:[._-]*[a-zA-Z0-9])*"
+    r"(?:\[[a-zA-Z0-9,_-]+\])?"
+    r"(?:[@=!<>~]++[a-zA-Z0-9.*+!,\-_.]+)?"
+)
+
+# Rule around the statistics summary
+_STATS_RULE = "=" * 50
+
 
 def display_statistics(stats: Dict[str, Any]):
     """Display execution statistics in a formatted way."""
     if not stats:
         return
 
-    print("\n" + "=" * 50)
+    print("\n" + _STATS_RULE)
     print("Execution Statistics")
-    print("=" * 50)
+    print(_STATS_RULE)
 
     if stats.get("tool_usage"):
         print("\nTool Usage:")
@@ -62,26 +74,48 @@ def display_statistics(stats: Dict[str, Any]):
         else:
             print(f"\nExecution time: {seconds:.1f}s")
 
-    print("=" * 50 + "\n")
+    print(_STATS_RULE + "\n")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_console():
+    """Get the rich console for responses, or None if rich is not installed."""
+    try:
+        from rich.console import Console
+    except ImportError:
+        return None
+    return Console()
 
 
 def display_response(messages):
     """Display the final agent response with rich formatting."""
+    from agentic_python_coder.agent import get_final_response
+
     content = get_final_response(messages)
     if content:
-        try:
-            from rich.console import Console
+        console = _get_console()
+        if console is not None:
             from rich.markdown import Markdown
 
-            console = Console()
             print()
             console.print(Markdown(content))
-        except ImportError:
+        else:
             print("\nAgent response:")
             print("-" * 40)
             print(content)
 
 
+def _positive_int(value: str) -> int:
+    """Parse a command line value that must be an integer of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def parse_args():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(
@@ -100,13 +134,36 @@ def parse_args():
         help="Task for the coder (inline task or reads from task.md if not provided)",
     )
 
-    parser.add_argument(
+    # The sources of the task(s) to run
+    task_source = parser.add_mutually_exclusive_group()
+
+    task_source.add_argument(
         "--task",
         "-t",
         dest="task_file",
         help="Path to task file (creates {basename}_code.py and {basename}.jsonl)",
     )
 
+    task_source.add_argument(
+        "--batch",
+        dest="batch_file",
+        help='Run tasks from a JSONL file concurrently (one {"task": ..., "basename": ...} per line)',
+    )
+
+    task_source.add_argument(
+        "--tasks-dir",
+        dest="tasks_dir",
+        help="Run all *.md task files in a directory concurrently",
+    )
+
+    parser.add_argument(
+        "--max-concurrency",
+        type=_positive_int,
+        default=DEFAULT_CONCURRENCY,
+        dest="max_concurrency",
+        help=f"Maximum number of batch tasks running at once (default: {DEFAULT_CONCURRENCY})",
+    )
+
     parser.add_argument("--model", help=f"Model to use (default: {MODEL_STRING})")
 
     parser.add_argument(
@@ -151,6 +208,13 @@ def parse_args():
         help="Suppress console output during execution",
     )
 
+    parser.add_argument(
+        "--force-progress",
+        action="store_true",
+        dest="force_progress",
+        help="Show tool progress even when output is not a terminal",
+    )
+
     parser.add_argument(
         "--step-limit",
         type=int,
@@ -158,6 +222,13 @@ def parse_args():
         help="Maximum agent steps before stopping (default: 200)",
     )
 
+    parser.add_argument(
+        "--max-history-tokens",
+        type=int,
+        dest="max_history_tokens",
+        help="Approximate token budget for the history sent to the LLM (default: full history)",
+    )
+
     parser.add_argument(
         "--init",
         nargs="?",
@@ -225,13 +296,7 @@ def validate_packages(packages):
     if not packages:
         return
 
-    pattern = re.compile(
-        r"^[a-zA-Z0-9]([a-zA-Z0-9._-]*[a-zA-Z0-9])?"
-        r"(\[[a-zA-Z0-9,_-]+\])?"
-        r"([@=!<>~]+[a-zA-Z0-9.*+!,\-_.]+)?$"
-    )
-
-    invalid = [pkg for pkg in packages if not pattern.match(pkg)]
+    invalid = [pkg for pkg in packages if not _PKG_RE.fullmatch(pkg)]
     if invalid:
         print(f"Error: Invalid package specifications: {', '.join(invalid)}")
         print("Expected format: 'package' or 'package>=version' or 'package[extras]'")
@@ -276,17 +341,98 @@ def load_project_prompt(project_path: str) -> Optional[str]:
         sys.exit(1)
 
 
+def load_batch(batch_path: Path) -> tuple[list, list]:
+    """Load tasks and basenames from a JSONL batch file."""
+    tasks, basenames = [], []
+    # Line of each basename; tasks sharing one would write the same files
+    basename_lines = {}
+    try:
+        with open(batch_path) as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if not isinstance(entry, dict):
+                    raise ValueError(f"line {line_no}: expected a JSON object")
+                basename = entry.get("basename") or f"task_{line_no}"
+                if basename in basename_lines:
+                    raise ValueError(
+                        f"line {line_no}: basename {basename!r} is already used "
+                        f"on line {basename_lines[basename]}"
+                    )
+                basename_lines[basename] = line_no
+                tasks.append(entry["task"])
+                basenames.append(basename)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error loading batch file: {e}")
+        sys.exit(1)
+    return tasks, basenames
+
+
+def load_tasks_dir(tasks_dir: Path) -> tuple[list, list]:
+    """Load tasks from the *.md files of a directory, named after the files."""
+    task_files = sorted(tasks_dir.glob("*.md"))
+    return [f.read_text() for f in task_files], [f.stem for f in task_files]
+
+
+def run_batch(
+    args, working_dir: Path, tasks: list, basenames: list, project_prompt: str
+):
+    """Solve a list of tasks concurrently."""
+    if not args.quiet:
+        print(
+            f"Running {len(tasks)} tasks with model {args.model or MODEL_STRING} "
+            f"(max {args.max_concurrency} at once)"
+        )
+
+    # Per-task progress output would interleave, so tasks always run quietly
+    results = solve_tasks(
+        tasks,
+        task_basenames=basenames,
+        concurrency=args.max_concurrency,
+        working_directory=str(working_dir),
+        model=args.model,
+        project_prompt=project_prompt,
+        with_packages=args.with_packages,
+        api_key=args.api_key,
+        todo=args.todo,
+        quiet=True,
+        save_log=True,
+        step_limit=args.step_limit,
+        max_history_tokens=args.max_history_tokens,
+    )
+
+    failed = 0
+    for basename, result in zip(basenames, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            print(f"  {basename}: failed ({result})")
+        elif not args.quiet:
+            print(f"  {basename}: done, log saved to {result[2]}")
+
+    if failed:
+        print(f"{failed} of {len(tasks)} tasks failed")
+        sys.exit(1)
+
+
 def run_interactive(
-    working_dir: Path, model: str, project_prompt: str, api_key: str, todo: bool
+    working_dir: Path,
+    model: str,
+    project_prompt: str,
+    api_key: str,
+    todo: bool,
+    max_history_tokens: Optional[int] = None,
 ):
     """Run the agent in interactive mode."""
+    from agentic_python_coder.agent import create_coding_agent, load_prompt, run_agent
+
     print(f"\nInteractive mode - working in: {working_dir}")
     if project_prompt:
         print("Project configuration loaded")
     print("Type 'exit' or 'quit' to stop.\n")
 
     # Load system prompt
-    system_prompt = get_system_prompt_path(todo).read_text()
+    system_prompt = load_prompt(get_system_prompt_path(todo))
 
     # Create agent once for the session
     agent = create_coding_agent(
@@ -297,12 +443,14 @@ def run_interactive(
         api_key=api_key,
         todo=todo,
         verbose=True,
+        max_history_tokens=max_history_tokens,
     )
 
     thread_id = "interactive"
-    all_messages = []
+    # Created with the first turn; each turn's events are appended to it
+    log = None
     cumulative_stats = {
-        "tool_usage": {},
+        "tool_usage": Counter(),
         "token_consumption": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
         "execution_time_seconds": 0,
     }
@@ -320,26 +468,26 @@ def run_interactive(
                     continue
 
                 print("\nAgent working...\n")
-                messages, stats = run_agent(agent, user_input, thread_id, quiet=False)
-                all_messages.extend(messages)
+                if log is None:
+                    log = ConversationLogger(working_dir)
+                messages, stats = run_agent(
+                    agent, user_input, thread_id, quiet=False, on_message=log.on_message
+                )
 
                 # Update cumulative stats
-                for tool, count in stats.get("tool_usage", {}).items():
-                    cumulative_stats["tool_usage"][tool] = (
-                        cumulative_stats["tool_usage"].get(tool, 0) + count
-                    )
+                cumulative_stats["tool_usage"].update(stats.get("tool_usage", {}))
 
-                for key in ["input_tokens", "output_tokens", "total_tokens"]:
-                    cumulative_stats["token_consumption"][key] += stats.get(
-                        "token_consumption", {}
-                    ).get(key, 0)
+                tokens = cumulative_stats["token_consumption"]
+                turn_tokens = stats.get("token_consumption", {})
+                for key in tokens:
+                    tokens[key] += turn_tokens.get(key, 0)
 
                 cumulative_stats["execution_time_seconds"] += stats.get(
                     "execution_time_seconds", 0
                 )
 
                 # Save after each interaction
-                save_conversation_log(working_dir, all_messages, cumulative_stats)
+                log.flush()
 
                 # Display response
                 display_response(messages)
@@ -352,26 +500,16 @@ def run_interactive(
                 print(f"\nError: {e}\n")
 
     finally:
-        if all_messages:
-            log_path = save_conversation_log(
-                working_dir, all_messages, cumulative_stats
-            )
+        if log is not None:
+            log.finish(cumulative_stats)
             if any(cumulative_stats.get("tool_usage", {}).values()):
                 print("\nSession Summary:")
                 display_statistics(cumulative_stats)
-            print(f"Log saved to: {log_path}")
+            print(f"Log saved to: {log.path}")
 
 
 def main():
     """Main CLI entry point."""
-    # Flush output immediately
-    import functools
-    import builtins
-
-    if not hasattr(builtins, "_original_print"):
-        builtins._original_print = builtins.print
-        builtins.print = functools.partial(builtins._original_print, flush=True)
-
     args = parse_args()
 
     # Handle --init command
@@ -391,6 +529,26 @@ def main():
             sys.exit(1)
         task_content = task_file_path.read_text()
 
+    batch = None
+    if args.batch_file:
+        batch_path = Path(args.batch_file).resolve()
+        if not batch_path.exists():
+            print(f"Error: Batch file not found: {args.batch_file}")
+            sys.exit(1)
+        batch = load_batch(batch_path)
+        if not batch[0]:
+            print(f"Error: No tasks in batch file: {args.batch_file}")
+            sys.exit(1)
+    elif args.tasks_dir:
+        tasks_dir = Path(args.tasks_dir).resolve()
+        if not tasks_dir.is_dir():
+            print(f"Error: Tasks directory not found: {args.tasks_dir}")
+            sys.exit(1)
+        batch = load_tasks_dir(tasks_dir)
+        if not batch[0]:
+            print(f"Error: No *.md task files in: {args.tasks_dir}")
+            sys.exit(1)
+
     if args.project:
         args.project = str(Path(args.project).resolve())
 
@@ -412,11 +570,13 @@ def main():
     validate_packages(args.with_packages)
     validate_model(args.model)
 
-    if not task_content and not args.interactive:
+    if not task_content and not args.interactive and not batch:
         print("Error: No task provided")
         print("\nUsage:")
         print('  coder "your task here"     # Inline task')
         print("  coder --task problem.md    # Task from file")
+        print("  coder --batch tasks.jsonl  # Several tasks concurrently")
+        print("  coder --tasks-dir tasks/   # All *.md tasks concurrently")
         print("  coder -i                   # Interactive mode")
         sys.exit(1)
 
@@ -427,8 +587,15 @@ def main():
     try:
         if args.interactive:
             run_interactive(
-                working_dir, args.model, project_prompt, args.api_key, args.todo
+                working_dir,
+                args.model,
+                project_prompt,
+                args.api_key,
+                args.todo,
+                args.max_history_tokens,
             )
+        elif batch:
+            run_batch(args, working_dir, *batch, project_prompt)
         else:
             # Use solve_task for the main flow
             if not args.quiet:
@@ -438,6 +605,11 @@ def main():
 
             task_basename = task_file_path.stem if task_file_path else None
 
+            # Tool progress is only worth computing when someone watches it
+            show_progress = not args.quiet and (
+                sys.stdout.isatty() or args.force_progress
+            )
+
             messages, stats, log_path = solve_task(
                 task=task_content,
                 working_directory=str(working_dir),
@@ -446,10 +618,11 @@ def main():
                 with_packages=args.with_packages,
                 api_key=args.api_key,
                 todo=args.todo,
-                quiet=args.quiet,
+                quiet=not show_progress,
                 save_log=True,
                 task_basename=task_basename,
                 step_limit=args.step_limit,
+                max_history_tokens=args.max_history_tokens,
             )
 
             if not args.quiet:
@@ -459,8 +632,7 @@ def main():
 
     except Exception as e:
         print(f"Error: {e}")
-        import traceback
-
+        sys.stdout.flush()
         traceback.print_exc()
         sys.exit(1)
 
@@ -4,128 +4,231 @@ import json
 import logging
 import shutil
 import threading
+import time
 import warnings
 import atexit
+import functools
 from typing import Dict, Optional, List
-from jupyter_client import KernelManager
-from queue import Empty
 
-# Configure logging - use environment variable or default to WARNING
-import os
-
-log_level = os.environ.get("CODER_LOG_LEVEL", "WARNING").upper()
-logging.basicConfig(
-    level=getattr(logging, log_level, logging.WARNING),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
-logger = logging.getLogger(__name__)
-
-# Global kernel instance and lock
-_kernel = None
-_kernel_lock = threading.Lock()
-
-# Suppress Jupyter warnings
-warnings.filterwarnings("ignore", category=DeprecationWarning)
 
+# Encoder of execution results and tool responses; like orjson, it keeps
+# non-ASCII text as is, so the model sees the same JSON either way
+_json_encode = json.JSONEncoder(indent=2, ensure_ascii=False).encode
 
-class UVKernelManager(KernelManager):
-    """KernelManager that can wrap kernel launch with UV for dynamic packages."""
+try:
+    # Faster encoding of large execution results (optional "fast" extra)
+    import orjson
 
-    def __init__(
-        self,
-        with_packages: Optional[List[str]] = None,
-        cwd: Optional[str] = None,
-        **kwargs,
-    ):
-        """Initialize the UV kernel manager.
-
-        Args:
-            with_packages: List of packages to include using UV's --with flag
-            cwd: Working directory for the kernel
-            **kwargs: Passed to parent KernelManager
+    def _dumps(obj) -> str:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+        except TypeError:
+            return _json_encode(obj)  # e.g. lone surrogates, huge integers
 
-        Raises:
-            RuntimeError: If UV is not available in the system PATH
-        """
-        super().__init__(**kwargs)
-        self.with_packages = with_packages
-        self.uv_cwd = cwd
-
-        # Check UV availability
-        if self.with_packages and not shutil.which("uv"):
-            raise RuntimeError(
-                "UV is required for dynamic package mode but not found in PATH. "
-                "Install it with: curl -LsSf https://astral.sh/uv/install.sh | sh"
-            )
+except ImportError:
+    _dumps = _json_encode
 
-    def format_kernel_cmd(self, extra_arguments=None):
-        """Override to wrap kernel command with UV if packages specified."""
-        # Let parent build the canonical ipykernel command
-        cmd = super().format_kernel_cmd(extra_arguments)
 
-        # If no packages specified, return unchanged
-        if not self.with_packages:
-            return cmd
+# Configure logging - silent by default, CODER_LOG_LEVEL enables a handler
+import os
 
-        # Build the UV wrapper
-        uv_prefix = ["uv", "run"]
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+_LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+_log_level = os.environ.get("CODER_LOG_LEVEL")
+if _log_level:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    logger.addHandler(_handler)
+    logger.setLevel(_LOG_LEVELS.get(_log_level.upper(), logging.WARNING))
+    logger.propagate = False
+
+# Connection file of an externally started kernel for the default session
+_CONNECTION_FILE = os.environ.get("CODER_KERNEL_CONNECTION_FILE")
+
+# Running kernels by session name (None is the shared default session)
+_kernels: Dict[Optional[str], "PythonKernel"] = {}
+_kernel_locks: Dict[Optional[str], threading.Lock] = {}
+_kernel_lock = threading.Lock()
 
-        # Set working directory (critical for file operations)
-        if self.uv_cwd:
-            uv_prefix.extend(["--directory", self.uv_cwd])
+# Suppress Jupyter warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-        # Don't load project dependencies (create clean environment)
-        uv_prefix.append("--no-project")
 
-        # Add user-specified packages
-        for pkg in self.with_packages:
-            uv_prefix.extend(["--with", pkg])
+@functools.lru_cache(maxsize=1)
+def _uv_path() -> Optional[str]:
+    """Locate the uv executable in PATH (looked up once per process)."""
+    return shutil.which("uv")
 
-        # Always need ipykernel for kernel communication
-        uv_prefix.extend(["--with", "ipykernel"])
 
-        # Replace the full python path with just "python" for UV to manage
-        # UV needs to control the Python environment
-        if cmd and cmd[0].endswith("python3"):
-            cmd = ["python"] + cmd[1:]
+@functools.cache
+def _kernel_manager_classes() -> tuple:
+    """Import jupyter_client and define UVKernelManager on first use.
 
-        # Return wrapped command
-        wrapped_cmd = uv_prefix + cmd
+    Deferring the import keeps it off the start-up path of commands that
+    never run code.
 
-        # Log the command for debugging
-        logger.debug(f"UV kernel command: {' '.join(wrapped_cmd)}")
+    Returns:
+        Tuple of (KernelManager, UVKernelManager)
+    """
+    from jupyter_client import KernelManager
+
+    class UVKernelManager(KernelManager):
+        """KernelManager that can wrap kernel launch with UV for dynamic packages."""
+
+        def __init__(
+            self,
+            with_packages: Optional[List[str]] = None,
+            cwd: Optional[str] = None,
+            **kwargs,
+        ):
+            """Initialize the UV kernel manager.
+
+            Args:
+                with_packages: List of packages to include using UV's --with flag
+                cwd: Working directory for the kernel
+                **kwargs: Passed to parent KernelManager
+
+            Raises:
+                RuntimeError: If UV is not available in the system PATH
+            """
+            super().__init__(**kwargs)
+            self.with_packages = with_packages
+            self.uv_cwd = cwd
+
+            # Check UV availability
+            self._uv_bin = _uv_path()
+            if self.with_packages and not self._uv_bin:
+                raise RuntimeError(
+                    "UV is required for dynamic package mode but not found in PATH. "
+                    "Install it with: curl -LsSf https://astral.sh/uv/install.sh | sh"
+                )
 
-        return wrapped_cmd
+            # Build the UV wrapper once; restarts reuse it
+            self._uv_prefix: Optional[List[str]] = None
+            if self.with_packages:
+                self._uv_prefix = [
+                    self._uv_bin,
+                    "run",
+                    # Set working directory (critical for file operations)
+                    *(("--directory", cwd) if cwd else ()),
+                    # Don't load project dependencies (create clean environment)
+                    "--no-project",
+                    # Add user-specified packages
+                    *(arg for pkg in self.with_packages for arg in ("--with", pkg)),
+                    # Always need ipykernel for kernel communication
+                    "--with",
+                    "ipykernel",
+                ]
+
+        def format_kernel_cmd(self, extra_arguments=None):
+            """Override to wrap kernel command with UV if packages specified."""
+            # Let parent build the canonical ipykernel command
+            cmd = super().format_kernel_cmd(extra_arguments)
+
+            # If no packages specified, return unchanged
+            if self._uv_prefix is None:
+                return cmd
+
+            # Replace the full python path with just "python" for UV to manage
+            # UV needs to control the Python environment
+            if cmd and cmd[0].endswith("python3"):
+                cmd = ["python"] + cmd[1:]
+
+            wrapped_cmd = self._uv_prefix + cmd
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("UV kernel command: %s", " ".join(wrapped_cmd))
+
+            return wrapped_cmd
+
+    return KernelManager, UVKernelManager
+
+
+def __getattr__(name: str):
+    """Provide KernelManager and UVKernelManager as lazy module attributes."""
+    if name == "KernelManager":
+        return _kernel_manager_classes()[0]
+    if name == "UVKernelManager":
+        return _kernel_manager_classes()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Run by the kernel itself before it accepts requests, which saves an
+# execute round-trip per start:
+# - configure IPython to always display the last value
+# - suppress pkg_resources deprecation warning from CPMpy
+_STARTUP_LINES = [
+    "import sys",
+    "import warnings",
+    "from IPython.core.interactiveshell import InteractiveShell",
+    "InteractiveShell.ast_node_interactivity = 'last_expr'",
+    "warnings.filterwarnings('ignore', message='pkg_resources is deprecated', category=UserWarning)",
+    "warnings.filterwarnings('ignore', message='.*pkg_resources.*', category=DeprecationWarning)",
+]
+_STARTUP_ARGUMENTS = [f"--IPKernelApp.exec_lines={line}" for line in _STARTUP_LINES]
+
+
+def _package_key(packages: List[str]) -> tuple:
+    """Canonical form of a package list, for cheap comparison."""
+    return tuple(sorted(set(packages)))
 
 
 class PythonKernel:
     """Manages a single IPython kernel for persistent code execution."""
 
     def __init__(
-        self, cwd: Optional[str] = None, with_packages: Optional[List[str]] = None
+        self,
+        cwd: Optional[str] = None,
+        with_packages: Optional[List[str]] = None,
+        connection_file: Optional[str] = None,
     ):
         """Initialize and start the kernel.
 
         Args:
             cwd: Working directory for the kernel process
             with_packages: List of packages to include using UV's --with flag
+            connection_file: Connect to the already running kernel described
+                by this file instead of starting one (with_packages is ignored)
 
         Raises:
             RuntimeError: If kernel fails to start or UV is not available
         """
+        # The client handles one execution at a time
+        self._execute_lock = threading.Lock()
+
+        if connection_file is not None:
+            self._connect(cwd, connection_file)
+            return
+
         # Store configuration for comparison
         self.cwd = cwd
         self.with_packages = with_packages or []
+        self.package_key = _package_key(self.with_packages)
+        # Only a non-empty package list starts the kernel under "uv run"
+        self.uses_uv = bool(with_packages)
 
-        # Set kernel's working directory
-        kernel_kwargs = {}
+        # Time of the last successful liveness check (see is_alive_cached)
+        self._last_alive_check = 0.0
+
+        # Set kernel's startup code and working directory
+        kernel_kwargs = {"extra_arguments": _STARTUP_ARGUMENTS}
         if cwd:
             kernel_kwargs["cwd"] = cwd
 
         try:
             # Create appropriate kernel manager
+            KernelManager, UVKernelManager = _kernel_manager_classes()
             if with_packages is not None:
-                logger.info(f"Starting UV kernel with packages: {with_packages}")
+                logger.info("Starting UV kernel with packages: %s", with_packages)
                 self.km = UVKernelManager(
                     with_packages=with_packages, cwd=cwd, kernel_name="python3"
                 )
@@ -134,11 +237,13 @@ class PythonKernel:
                 self.km = KernelManager(kernel_name="python3")
 
             # Start the kernel
-            logger.debug(f"Starting kernel in directory: {cwd}")
+            logger.debug("Starting kernel in directory: %s", cwd)
             self.km.start_kernel(**kernel_kwargs)
             self.kc = self.km.client()
             self.kc.start_channels()
 
+            self._watch_iopub()
+
             # Wait for kernel to be ready
             logger.debug("Waiting for kernel to be ready...")
             self.kc.wait_for_ready(
@@ -146,26 +251,54 @@ class PythonKernel:
             )  # Increased timeout for UV package installation
             logger.info("Kernel started successfully")
 
-            # Configure IPython to always display the last value
-            # and suppress pkg_resources deprecation warning from CPMpy
-            startup_code = """
-import sys
-import warnings
-from IPython.core.interactiveshell import InteractiveShell
-InteractiveShell.ast_node_interactivity = 'last_expr'
+        except Exception as e:
+            logger.error("Failed to start kernel: %s", e)
+            # Clean up any partially started resources
+            self._cleanup_on_error()
+            raise RuntimeError(f"Failed to start kernel: {e}") from e
+
+    def _connect(self, cwd: Optional[str], connection_file: str):
+        """Attach to a running kernel; it is left running on shutdown."""
+        self.cwd = None
+        self.with_packages = []
+        self.package_key = ()
+        self.uses_uv = False
+        self._last_alive_check = 0.0
+        self.km = None
+
+        try:
+            from jupyter_client import BlockingKernelClient
 
-# Suppress pkg_resources deprecation warning from CPMpy
-warnings.filterwarnings('ignore', message='pkg_resources is deprecated', category=UserWarning)
-warnings.filterwarnings('ignore', message='.*pkg_resources.*', category=DeprecationWarning)
-"""
-            self.execute(startup_code)
+            logger.info("Connecting to kernel: %s", connection_file)
+            self.kc = BlockingKernelClient()
+            self.kc.load_connection_file(connection_file)
+            self.kc.start_channels()
+
+            self._watch_iopub()
+
+            self.kc.wait_for_ready(timeout=10)
+
+            # The kernel was not started with our startup code
+            output = self.execute("\n".join(_STARTUP_LINES))
+            if output["error"]:
+                raise RuntimeError(output["error"])
+            if cwd:
+                self.change_directory(cwd)
 
         except Exception as e:
-            logger.error(f"Failed to start kernel: {e}")
-            # Clean up any partially started resources
+            logger.error("Failed to connect to kernel: %s", e)
             self._cleanup_on_error()
             raise RuntimeError(f"Failed to start kernel: {e}") from e
 
+    def _watch_iopub(self):
+        """Poll the iopub socket directly so execute() can drain it in batches."""
+        # Imported with jupyter_client, on first kernel start
+        import zmq
+
+        self._iopub_socket = self.kc.iopub_channel.socket
+        self._poller = zmq.Poller()
+        self._poller.register(self._iopub_socket, zmq.POLLIN)
+
     def _cleanup_on_error(self):
         """Clean up resources if initialization fails."""
         try:
@@ -177,6 +310,21 @@ warnings.filterwarnings('ignore', message='.*pkg_resources.*', category=Deprecat
         except Exception:
             pass  # Best effort cleanup
 
+    def is_alive_cached(self, max_age: float = 0.5) -> bool:
+        """Check whether the kernel process is alive, reusing a recent answer.
+
+        Args:
+            max_age: Seconds for which a positive check is trusted
+        """
+        now = time.monotonic()
+        if now - self._last_alive_check < max_age:
+            return True
+        # A kernel we connected to is checked through its heartbeat
+        alive = self.km.is_alive() if self.km else self.kc.is_alive()
+        if alive:
+            self._last_alive_check = now
+        return alive
+
     def execute(self, code: str, poll_timeout: int = 30) -> Dict[str, str]:
         """Execute code and return output.
 
@@ -187,29 +335,63 @@ warnings.filterwarnings('ignore', message='.*pkg_resources.*', category=Deprecat
         Returns:
             Dict with stdout, stderr, result, and error fields
         """
+        try:
+            with self._execute_lock:
+                return self._execute(code, poll_timeout)
+        except Exception:
+            # The kernel may have died; make the next liveness check real
+            self._last_alive_check = 0.0
+            raise
+
+    def _execute(self, code: str, poll_timeout: int) -> Dict[str, str]:
+        """Run code in the kernel and collect its output (see execute)."""
+        import zmq  # loaded by _watch_iopub() already
+
         # Send the execution request (silent=False to get execute_result)
         msg_id = self.kc.execute(code, silent=False, store_history=True)
 
-        # Collect output
+        # Collect output; stream chunks are joined once at the end
         output = {"stdout": "", "stderr": "", "result": None, "error": None}
+        streams: Dict[str, List[str]] = {"stdout": [], "stderr": []}
+
+        # Read iopub frames directly: only the parent header of each message
+        # is decoded until it is known to belong to this execution
+        socket = self._iopub_socket
+        session = self.kc.session
+        msg_id_bytes = msg_id.encode()
 
         # Wait for and collect messages
         execution_state = "busy"
         while execution_state != "idle":
-            try:
-                msg = self.kc.get_iopub_msg(timeout=poll_timeout)
-                msg_type = msg["header"]["msg_type"]
-                content = msg["content"]
+            if not self._poller.poll(poll_timeout * 1000):
+                self._last_alive_check = 0.0
+                break
+
+            # Drain everything that has arrived
+            while execution_state != "idle":
+                try:
+                    frames = socket.recv_multipart(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                _, frames = session.feed_identities(frames)
 
                 # Only process messages for our execution
-                if msg["parent_header"].get("msg_id") != msg_id:
+                # (frames are [signature, header, parent_header, ...]);
+                # a substring test rejects most foreign messages unparsed
+                parent = frames[2]
+                if msg_id_bytes not in parent:
+                    continue
+                if session.unpack(parent).get("msg_id") != msg_id:
                     continue
 
+                msg = session.deserialize(frames)
+                msg_type = msg["header"]["msg_type"]
+                content = msg["content"]
+
                 if msg_type == "stream":
-                    if content["name"] == "stdout":
-                        output["stdout"] += content["text"]
-                    elif content["name"] == "stderr":
-                        output["stderr"] += content["text"]
+                    parts = streams.get(content["name"])
+                    if parts is not None:
+                        parts.append(content["text"])
                 elif msg_type == "execute_result":
                     output["result"] = content["data"].get("text/plain", "")
                 elif msg_type == "error":
@@ -219,11 +401,73 @@ warnings.filterwarnings('ignore', message='.*pkg_resources.*', category=Deprecat
                         output["error"] += "\n" + "\n".join(content["traceback"])
                 elif msg_type == "status":
                     execution_state = content["execution_state"]
-            except Empty:
-                break
 
+        output["stdout"] = "".join(streams["stdout"])
+        output["stderr"] = "".join(streams["stderr"])
         return output
 
+    def change_directory(self, cwd: str):
+        """Move the kernel to another working directory with a fresh namespace.
+
+        This clears the user namespace and drops imported modules from the old
+        working directory, but unlike a restart it keeps all other interpreter
+        state (other imported modules, sys.path, threads, library settings).
+        get_kernel() therefore only uses it for kernels that have not run
+        code in another directory yet, and for connected kernels.
+
+        Raises:
+            RuntimeError: If the kernel could not change directory
+        """
+        code = "%reset -f\n"
+        if self.cwd:
+            # Local modules of the old directory would shadow the new ones
+            prefix = os.path.join(self.cwd, "")
+            code += (
+                "[__import__('sys').modules.pop(name) for name, module in "
+                "list(__import__('sys').modules.items()) "
+                f"if (getattr(module, '__file__', None) or '').startswith({prefix!r})]\n"
+            )
+        code += f"__import__('os').chdir({cwd!r})"
+        output = self.execute(code)
+        if output["error"]:
+            raise RuntimeError(f"Failed to change directory: {output['error']}")
+        self.cwd = cwd
+
+    def install_packages(self, packages: List[str]) -> bool:
+        """Install additional packages into the environment of a UV kernel.
+
+        Other kernels run on the host interpreter, whose environment must not
+        be changed; they have to be restarted instead. Note that the
+        environment of a UV kernel is uv's cached environment for the initial
+        package set, so later kernels started with the same packages also see
+        the added ones.
+
+        Args:
+            packages: Package specifications to add
+
+        Returns:
+            True if the packages were installed, False if the kernel has to
+            be restarted instead
+        """
+        if not self.uses_uv:
+            return False
+
+        uv = _uv_path() or "uv"
+        code = (
+            "import subprocess, sys\n"
+            f"subprocess.run([{uv!r}, 'pip', 'install', '--python', sys.executable, "
+            f"*{packages!r}], check=True, capture_output=True)"
+        )
+        # Resolving packages can take a while without any kernel output
+        output = self.execute(code, poll_timeout=300)
+        if output["error"]:
+            logger.warning("Installing %s in the kernel failed", packages)
+            return False
+
+        self.with_packages = self.with_packages + packages
+        self.package_key = _package_key(self.with_packages)
+        return True
+
     def shutdown(self):
         """Shutdown the kernel and clean up."""
         try:
@@ -245,75 +489,136 @@ warnings.filterwarnings('ignore', message='.*pkg_resources.*', category=Deprecat
             pass
 
 
+def _session_lock(session: Optional[str]) -> threading.Lock:
+    """Get the lock serializing kernel creation for a session."""
+    with _kernel_lock:
+        return _kernel_locks.setdefault(session, threading.Lock())
+
+
+def _new_kernel(
+    cwd: Optional[str], with_packages: Optional[List[str]], session: Optional[str]
+) -> "PythonKernel":
+    """Start the kernel of a session, or connect to CODER_KERNEL_CONNECTION_FILE."""
+    if session is None and with_packages is None and _CONNECTION_FILE:
+        return PythonKernel(cwd, connection_file=_CONNECTION_FILE)
+    return PythonKernel(cwd, with_packages)
+
+
 def get_kernel(
-    cwd: Optional[str] = None, with_packages: Optional[List[str]] = None
+    cwd: Optional[str] = None,
+    with_packages: Optional[List[str]] = None,
+    session: Optional[str] = None,
 ) -> PythonKernel:
-    """Get or create the global kernel instance.
+    """Get or create the kernel instance for a session.
 
-    If a kernel is already running, it will be shut down and replaced if the
-    requested `cwd` or `with_packages` are different.
+    A running kernel is reused when the requested `with_packages` grow: the
+    added packages are installed in place. It is replaced if it died, if
+    packages were removed, if the in-place installation is not possible, or
+    if `cwd` changes. A prewarmed kernel, started without a `cwd`, and a
+    connected kernel change directory (with a fresh namespace) instead.
+
+    If CODER_KERNEL_CONNECTION_FILE is set, the default session connects to
+    that already running kernel instead of starting one, unless packages
+    are requested.
 
     Args:
         cwd: Working directory for the kernel
         with_packages: List of packages to include using UV's --with flag
+        session: Name of the kernel session (default: the shared kernel)
 
     Returns:
-        The global kernel instance
+        The kernel instance of the session
 
     Raises:
         RuntimeError: If kernel fails to start
     """
-    global _kernel
-
     requested_packages = with_packages or []
 
-    with _kernel_lock:
+    with _session_lock(session):
+        kernel = _kernels.get(session)
+
         # Check if kernel is dead or if configuration has changed
         kernel_is_stale = False
 
-        if _kernel is None:
+        if kernel is None:
             logger.debug("No existing kernel found")
             kernel_is_stale = True
-        elif not _kernel.km.is_alive():
+        elif not kernel.is_alive_cached():
             logger.warning("Existing kernel is dead, will restart")
             kernel_is_stale = True
-        elif _kernel.cwd != cwd:
-            logger.info(
-                f"Working directory changed from {_kernel.cwd} to {cwd}, restarting kernel"
-            )
-            kernel_is_stale = True
-        elif set(_kernel.with_packages) != set(requested_packages):
-            logger.info(
-                f"Package list changed from {_kernel.with_packages} to {requested_packages}, restarting kernel"
-            )
-            kernel_is_stale = True
+        elif kernel.package_key != _package_key(requested_packages):
+            added = [p for p in requested_packages if p not in kernel.with_packages]
+            if not set(kernel.with_packages) <= set(requested_packages):
+                logger.info(
+                    "Package list changed from %s to %s, restarting kernel",
+                    kernel.with_packages,
+                    requested_packages,
+                )
+                kernel_is_stale = True
+            elif kernel.install_packages(added):
+                logger.info("Installed %s in the running kernel", added)
+            else:
+                kernel_is_stale = True
+
+        if not kernel_is_stale and kernel.cwd != cwd:
+            # Code run in another directory may have left state behind that
+            # only a restart clears; prewarmed and connected kernels are reused
+            if cwd is None or (kernel.cwd is not None and kernel.km is not None):
+                logger.info(
+                    "Working directory changed from %s to %s, restarting kernel",
+                    kernel.cwd,
+                    cwd,
+                )
+                kernel_is_stale = True
+            else:
+                logger.info(
+                    "Working directory changed from %s to %s, resetting kernel",
+                    kernel.cwd,
+                    cwd,
+                )
+                try:
+                    kernel.change_directory(cwd)
+                except RuntimeError:
+                    kernel_is_stale = True
 
         if kernel_is_stale:
-            if _kernel:
+            if kernel:
                 logger.info("Shutting down existing kernel")
-                _kernel.shutdown()  # Clean up old kernel
+                kernel.shutdown()  # Clean up old kernel
+                _kernels.pop(session, None)
 
             logger.info(
-                f"Creating new kernel with cwd={cwd}, packages={requested_packages}"
+                "Creating new kernel with cwd=%s, packages=%s", cwd, requested_packages
             )
             try:
-                _kernel = PythonKernel(cwd, with_packages)
+                kernel = _new_kernel(cwd, with_packages, session)
             except Exception as e:
-                logger.error(f"Failed to create kernel: {e}")
-                _kernel = None
+                logger.error("Failed to create kernel: %s", e)
                 raise
+            _kernels[session] = kernel
+
+        return kernel
 
-        return _kernel
 
+def shutdown_kernel(session: Optional[str] = None):
+    """Shutdown the kernel of a session if it exists."""
+    with _session_lock(session):
+        kernel = _kernels.pop(session, None)
+        if kernel is not None:
+            kernel.shutdown()
 
-def shutdown_kernel():
-    """Shutdown the global kernel if it exists."""
-    global _kernel
 
+def shutdown_all_kernels():
+    """Shutdown the kernels of all sessions."""
     with _kernel_lock:
-        if _kernel is not None:
-            _kernel.shutdown()
-            _kernel = None
+        sessions = list(_kernels)
+    for session in sessions:
+        shutdown_kernel(session)
+
+
+def _rstrip(text: str) -> str:
+    """Strip trailing whitespace, without copying text that has none."""
+    return text.rstrip() if text[-1:].isspace() else text
 
 
 def format_output(output: Dict[str, str]) -> str:
@@ -321,19 +626,37 @@ def format_output(output: Dict[str, str]) -> str:
     # Clean up the output
     result = {
         "success": output.get("error") is None,
-        "stdout": output.get("stdout", "").rstrip() if output.get("stdout") else None,
+        "stdout": _rstrip(output["stdout"]) if output.get("stdout") else None,
         "result": output.get("result")
         if output.get("result") and output["result"] != "None"
         else None,
-        "stderr": output.get("stderr", "").rstrip() if output.get("stderr") else None,
+        "stderr": _rstrip(output["stderr"]) if output.get("stderr") else None,
         "error": output.get("error") if output.get("error") else None,
     }
 
     # Remove None values for cleaner output
     result = {k: v for k, v in result.items() if v is not None}
 
-    return json.dumps(result, indent=2)
+    return _dumps(result)
+
+
+def _prewarm_kernel():
+    """Create the default kernel unless a caller has already created it.
+
+    Like get_kernel(), this connects to CODER_KERNEL_CONNECTION_FILE if set.
+    """
+    try:
+        with _session_lock(None):
+            if None not in _kernels:
+                _kernels[None] = _new_kernel(None, None, None)
+    except Exception as e:
+        logger.warning("Failed to prewarm kernel: %s", e)
 
 
 # Register cleanup on exit
-atexit.register(shutdown_kernel)
+atexit.register(shutdown_all_kernels)
+
+# Optionally start the kernel in the background while the caller sets up;
+# the first get_kernel() call then only adjusts its directory
+if os.environ.get("CODER_PREWARM_KERNEL") == "1":
+    threading.Thread(target=_prewarm_kernel, daemon=True).start()
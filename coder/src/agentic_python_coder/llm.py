@@ -1,11 +1,16 @@
 """LLM configuration for OpenRouter."""
 
+import functools
 import os
-from typing import Optional
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Optional
 from pathlib import Path
 
+# LangChain is heavy to import; it is loaded when an LLM or the cache is created
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+    from agentic_python_coder.cache import DiskLLMCache
+
 # Model aliases to full OpenRouter paths
 MODEL_REGISTRY = {
     "deepseek": "deepseek/deepseek-chat-v3.1",
@@ -104,9 +109,24 @@ DEFAULT_CONFIG = {
 MODEL_STRING = "anthropic/claude-sonnet-4.5"
 
 
+@functools.cache
+def get_llm_cache(sampled: bool = False) -> "DiskLLMCache":
+    """Get the shared on-disk LLM response cache (created on first use).
+
+    Args:
+        sampled: Get the cache keeping several responses per request
+    """
+    from agentic_python_coder.cache import DiskLLMCache
+
+    return DiskLLMCache(sampled=sampled)
+
+
+@functools.lru_cache(maxsize=1)
 def get_api_key() -> str:
     """Get API key from environment or config file.
 
+    The key is resolved once per process; a missing key is not cached.
+
     Returns:
         API key string
 
@@ -116,6 +136,8 @@ def get_api_key() -> str:
     # Load from ~/.config/coder/.env
     config_env = Path.home() / ".config" / "coder" / ".env"
     if config_env.exists():
+        from dotenv import load_dotenv
+
         load_dotenv(dotenv_path=config_env, override=True)
 
     # Get API key from environment
@@ -131,12 +153,64 @@ def get_api_key() -> str:
     return api_key
 
 
+@functools.lru_cache(maxsize=32)
+def _build_llm_kwargs(model_path: str, temperature: Optional[float]) -> tuple:
+    """Build the ChatOpenAI settings of a model, except for the API key.
+
+    Returns:
+        Tuple of (name, value) items; convert with dict() before use
+    """
+    config = MODEL_CONFIGS.get(model_path) or DEFAULT_CONFIG
+
+    # Create base kwargs
+    llm_kwargs = {
+        "model": model_path,
+        "openai_api_base": "https://openrouter.ai/api/v1",
+        "default_headers": {
+            "HTTP-Referer": "https://github.com/szeider/agentic-python-coder",
+            "X-Title": "Agentic Python Coder",
+        },
+        "streaming": config["streaming"],
+        "model_kwargs": config.get("model_kwargs", {}),
+    }
+
+    # Special case for GPT-5: NO sampling parameters
+    if model_path == "openai/gpt-5":
+        # Only add max_tokens for GPT-5
+        if "max_tokens" in config:
+            llm_kwargs["max_tokens"] = config["max_tokens"]
+    else:
+        # All other models get standard parameters
+        llm_kwargs["temperature"] = config.get("temperature", 0.0)
+        if temperature is not None:  # Allow override
+            llm_kwargs["temperature"] = temperature
+
+        # Add optional parameters
+        for name in (
+            "max_tokens",
+            "top_p",
+            "top_k",
+            "frequency_penalty",
+            "presence_penalty",
+        ):
+            if name in config:
+                llm_kwargs[name] = config[name]
+
+    # Add request_timeout for models that need it (e.g., Gemini)
+    if "request_timeout" in config:
+        llm_kwargs["request_timeout"] = config["request_timeout"]
+
+    return tuple(llm_kwargs.items())
+
+
 def get_openrouter_llm(
     model: str = "default",
     temperature: Optional[float] = None,
     api_key: Optional[str] = None,
     verbose: bool = False,
-) -> ChatOpenAI:
+    cache: Optional[bool] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> "ChatOpenAI":
     """Create a fully configured OpenRouter LLM instance.
     Special handling for GPT-5 which doesn't accept sampling parameters.
 
@@ -145,6 +219,12 @@ def get_openrouter_llm(
         temperature: Optional temperature override
         api_key: Optional API key
         verbose: If True, print model info to console (default False for library use)
+        cache: If True, serve repeated deterministic (temperature 0) requests
+            from an on-disk cache; None enables it when CODER_LLM_CACHE is set.
+            With CODER_LLM_CACHE=samples, other models replay the responses
+            stored for identical earlier requests, one per repetition
+        prompt_cache_key: Optional key sent with every request so the provider
+            routes requests sharing a prompt prefix to the same cache
 
     Returns:
         Fully configured ChatOpenAI instance
@@ -155,8 +235,6 @@ def get_openrouter_llm(
     # Handle direct model path (backward compatibility)
     if "/" in model:
         model_path = model
-        # Get config for this path or use default
-        config = MODEL_CONFIGS.get(model_path, DEFAULT_CONFIG.copy())
     else:
         # Resolve alias to full path
         if model not in MODEL_REGISTRY:
@@ -165,8 +243,8 @@ def get_openrouter_llm(
 
         model_path = MODEL_REGISTRY[model]
 
-        # Get hardcoded config for this model
-        config = MODEL_CONFIGS.get(model_path, DEFAULT_CONFIG.copy())
+    # Get hardcoded config for this model (read-only)
+    config = MODEL_CONFIGS.get(model_path) or DEFAULT_CONFIG
 
     # Print model info only if verbose
     if verbose and model != "default":
@@ -185,45 +263,23 @@ def get_openrouter_llm(
     if not api_key:
         api_key = get_api_key()
 
-    # Create base kwargs
-    llm_kwargs = {
-        "model": model_path,
-        "openai_api_key": api_key,
-        "openai_api_base": "https://openrouter.ai/api/v1",
-        "default_headers": {
-            "HTTP-Referer": "https://github.com/szeider/agentic-python-coder",
-            "X-Title": "Agentic Python Coder",
-        },
-        "streaming": config["streaming"],
-        "model_kwargs": config.get("model_kwargs", {}),
-    }
+    llm_kwargs = dict(_build_llm_kwargs(model_path, temperature))
+    llm_kwargs["openai_api_key"] = api_key
 
-    # Special case for GPT-5: NO sampling parameters
-    if model_path == "openai/gpt-5":
-        # Only add max_tokens for GPT-5
-        if "max_tokens" in config:
-            llm_kwargs["max_tokens"] = config["max_tokens"]
-    else:
-        # All other models get standard parameters
-        llm_kwargs["temperature"] = config.get("temperature", 0.0)
-        if temperature is not None:  # Allow override
-            llm_kwargs["temperature"] = temperature
+    if prompt_cache_key:
+        llm_kwargs["extra_body"] = {"prompt_cache_key": prompt_cache_key}
 
-        # Add optional parameters
-        if "max_tokens" in config:
-            llm_kwargs["max_tokens"] = config["max_tokens"]
-        if "top_p" in config:
-            llm_kwargs["top_p"] = config["top_p"]
-        if "top_k" in config:
-            llm_kwargs["top_k"] = config["top_k"]
-        if "frequency_penalty" in config:
-            llm_kwargs["frequency_penalty"] = config["frequency_penalty"]
-        if "presence_penalty" in config:
-            llm_kwargs["presence_penalty"] = config["presence_penalty"]
+    # Identical requests only yield identical answers at temperature 0;
+    # sampled models may only replay responses one per repetition
+    cache_mode = os.getenv("CODER_LLM_CACHE")
+    if cache is None:
+        cache = bool(cache_mode)
+    if cache and llm_kwargs.get("temperature") == 0:
+        llm_kwargs["cache"] = get_llm_cache()
+    elif cache and cache_mode == "samples":
+        llm_kwargs["cache"] = get_llm_cache(sampled=True)
 
-    # Add request_timeout for models that need it (e.g., Gemini)
-    if "request_timeout" in config:
-        llm_kwargs["request_timeout"] = config["request_timeout"]
+    from langchain_openai import ChatOpenAI
 
     llm = ChatOpenAI(**llm_kwargs)
 
@@ -1,10 +1,15 @@
 """Simple markdown-based project system."""
 
+import functools
 import re
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
+import importlib
 import importlib.util
 
+# Packages block at the start of a project file
+_PACKAGES_RE = re.compile(r"^```packages\s*\n(.*?)\n```\s*\n", re.MULTILINE | re.DOTALL)
+
 
 def parse_project_file(file_path: str) -> Tuple[List[str], str]:
     """Parse a project markdown file.
@@ -21,11 +26,12 @@ def parse_project_file(file_path: str) -> Tuple[List[str], str]:
     if not path.exists():
         raise FileNotFoundError(f"Project file not found: {file_path}")
 
-    content = path.read_text()
+    content = path.read_text(encoding="utf-8")
 
     # Look for ```packages block at the start
-    packages_pattern = r"^```packages\s*\n(.*?)\n```\s*\n"
-    match = re.match(packages_pattern, content, re.MULTILINE | re.DOTALL)
+    if not content.startswith("```packages"):
+        return [], content
+    match = _PACKAGES_RE.match(content)
 
     packages = []
     remaining_content = content
@@ -33,7 +39,9 @@ def parse_project_file(file_path: str) -> Tuple[List[str], str]:
     if match:
         # Extract package names
         packages_text = match.group(1)
-        packages = [pkg.strip() for pkg in packages_text.split("\n") if pkg.strip()]
+        packages = [
+            pkg for pkg in (line.strip() for line in packages_text.splitlines()) if pkg
+        ]
 
         # Remove the packages block from content
         remaining_content = content[match.end() :]
@@ -41,6 +49,16 @@ def parse_project_file(file_path: str) -> Tuple[List[str], str]:
     return packages, remaining_content
 
 
+@functools.cache
+def _spec_exists(package: str) -> bool:
+    """Check whether the host interpreter can import a package; cached per name.
+
+    Kernels install packages into their own environment, never into this
+    one, so a cached result stays valid for the life of the process.
+    """
+    return importlib.util.find_spec(package) is not None
+
+
 def check_packages_available(packages: List[str]) -> List[str]:
     """Check which packages are available in the environment.
 
@@ -50,15 +68,37 @@ def check_packages_available(packages: List[str]) -> List[str]:
     Returns:
         List of unavailable packages
     """
-    unavailable = []
+    return [package for package in packages if not _spec_exists(package)]
+
+
+def _iter_prompt_parts(
+    packages: List[str], content: str, unavailable: List[str]
+) -> Iterator[str]:
+    """Yield the lines of the project prompt (see create_project_prompt)."""
+    # Add header
+    yield "\n## Project Configuration Active\n"
 
-    for package in packages:
-        # Try to find the package
-        spec = importlib.util.find_spec(package)
-        if spec is None:
-            unavailable.append(package)
+    # Add available packages if any
+    if packages:
+        yield "### Package Status"
 
-    return unavailable
+        # Show available packages
+        missing = set(unavailable)
+        available = [pkg for pkg in packages if pkg not in missing]
+        if available:
+            yield "\n**✅ Available for import:**"
+            yield from (f"- `{pkg}`" for pkg in available)
+
+        # Show unavailable packages
+        if unavailable:
+            yield "\n**❌ NOT available (will cause ImportError):**"
+            yield from (f"- `{pkg}`" for pkg in unavailable)
+            yield "\n⚠️ You must work around these missing packages using only standard library or the available packages listed above."
+
+        yield ""
+
+    # Add the project content
+    yield content
 
 
 def create_project_prompt(
@@ -74,36 +114,4 @@ def create_project_prompt(
     Returns:
         Formatted project prompt
     """
-    prompt_parts = []
-
-    # Add header
-    prompt_parts.append("\n## Project Configuration Active\n")
-
-    # Add available packages if any
-    if packages:
-        prompt_parts.append("### Package Status")
-
-        # Show available packages
-        available = [
-            pkg for pkg in packages if not unavailable or pkg not in unavailable
-        ]
-        if available:
-            prompt_parts.append("\n**✅ Available for import:**")
-            for pkg in available:
-                prompt_parts.append(f"- `{pkg}`")
-
-        # Show unavailable packages
-        if unavailable:
-            prompt_parts.append("\n**❌ NOT available (will cause ImportError):**")
-            for pkg in unavailable:
-                prompt_parts.append(f"- `{pkg}`")
-            prompt_parts.append(
-                "\n⚠️ You must work around these missing packages using only standard library or the available packages listed above."
-            )
-
-        prompt_parts.append("")
-
-    # Add the project content
-    prompt_parts.append(content)
-
-    return "\n".join(prompt_parts)
+    return "\n".join(_iter_prompt_parts(packages, content, unavailable or []))
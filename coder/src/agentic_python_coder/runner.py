@@ -1,15 +1,60 @@
 """High-level runner for coding tasks."""
 
+import asyncio
+import contextlib
+import contextvars
+import functools
+import io
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Awaitable, Dict, Iterator, Union
 
-from agentic_python_coder.agent import create_coding_agent, run_agent
-from agentic_python_coder.tools import get_reported_issues
+# The agent and tools modules load LangGraph/LangChain; they are imported
+# where needed so that the logging helpers can be used without them.
 
+try:
+    # Faster log encoding and tool response parsing (optional "fast" extra)
+    import orjson
+except ImportError:
+    orjson = None
 
-def get_system_prompt_path(todo: bool = False) -> Path:
-    """Get the path to the system prompt in the codebase.
+_json_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Default number of tasks solve_tasks runs at the same time
+DEFAULT_CONCURRENCY = 8
+
+
+def _encode_event(event: Dict[str, Any]) -> bytes:
+    """Encode a log event as one line of compact UTF-8 JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(event, option=orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            pass  # e.g. lone surrogates; fall back to json
+    # Lone surrogates (possible in model output) cannot be encoded as UTF-8
+    return (_json_encode(event) + "\n").encode("utf-8", "backslashreplace")
+
+
+def run_sync(coroutine: Awaitable[Any]) -> Any:
+    """Run a coroutine to completion from synchronous code.
+
+    asyncio.run() cannot be used inside a running event loop (e.g. in
+    Jupyter); the coroutine then runs in a worker thread with a loop of its
+    own, and in a copy of the caller's context, while the caller waits.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(context.run, asyncio.run, coroutine).result()
+
+
+def _find_prompts_dir() -> Path:
+    """Locate the prompts directory.
 
     Handles both development (editable) and installed package structures.
     """
@@ -17,9 +62,19 @@ def get_system_prompt_path(todo: bool = False) -> Path:
 
     # Check if prompts is at current level (installed package)
     prompts_dir = current_dir / "prompts"
-    if not prompts_dir.exists():
+    if not prompts_dir.is_dir():
         # Editable install: go up to coder/ root, then to prompts/
         prompts_dir = current_dir.parent.parent / "prompts"
+    return prompts_dir
+
+
+_PROMPTS_DIR = _find_prompts_dir()
+
+
+@functools.lru_cache(maxsize=2)
+def get_system_prompt_path(todo: bool = False) -> Path:
+    """Get the path to the system prompt in the codebase."""
+    prompts_dir = _PROMPTS_DIR
 
     if todo:
         system_prompt_path = prompts_dir / "system_todo.md"
@@ -35,161 +90,238 @@ def get_system_prompt_path(todo: bool = False) -> Path:
     return system_prompt_path
 
 
+def _todo_event(args: Dict[str, Any]) -> Dict[str, Any]:
+    todos = args.get("todos", [])
+    return {
+        "event": "todo",
+        "action": "update",
+        "count": len(todos),
+        "tasks": [
+            {"content": t.get("content", ""), "status": t.get("status", "")}
+            for t in todos
+        ],
+    }
+
+
+# Events with a fixed shape are written from pre-encoded templates; only
+# the integer field is formatted in
+def _python_exec_event(args: Dict[str, Any]) -> bytes:
+    return b'{"event":"python_exec","code_length":%d}\n' % len(args.get("code") or "")
+
+
+def _save_code_event(args: Dict[str, Any]) -> bytes:
+    return b'{"event":"save_code","code_length":%d}\n' % len(args.get("code") or "")
+
+
+@functools.lru_cache(maxsize=64)
+def _tool_call_event(tool_name: str) -> bytes:
+    return _encode_event({"event": "tool_call", "tool": tool_name})
+
+
+_COMPLETE_EVENTS = {
+    False: _encode_event({"event": "complete", "status": "success"}),
+    True: _encode_event({"event": "complete", "status": "success_with_issues"}),
+}
+
+
+def _report_issue_event(args: Dict[str, Any]) -> Dict[str, Any]:
+    # Slicing copies only the kept prefix; a null text logs as empty
+    return {"event": "report_issue", "issue": (args.get("text") or "")[:200]}
+
+
+# Log event builders for tool calls, by tool name (others get a generic
+# event); they return an event dict or an encoded line
+_TOOL_EVENTS = {
+    "todo_write": _todo_event,
+    "python_exec": _python_exec_event,
+    "save_code": _save_code_event,
+    "report_issue": _report_issue_event,
+}
+
+
+def _message_events(msg: Any) -> Iterator[Union[Dict[str, Any], bytes]]:
+    """Yield the log events (dicts or encoded lines) for one agent message."""
+    tool_calls = getattr(msg, "tool_calls", None)
+    if tool_calls:
+        for tool_call in tool_calls:
+            if isinstance(tool_call, dict):
+                tool_name = tool_call.get("name", "unknown")
+                tool_args = tool_call.get("args", {})
+            else:
+                tool_name = getattr(tool_call, "name", "unknown")
+                tool_args = getattr(tool_call, "args", {})
+
+            handler = _TOOL_EVENTS.get(tool_name)
+            if handler is not None:
+                yield handler(tool_args)
+            elif isinstance(tool_name, str):
+                yield _tool_call_event(tool_name)
+            else:
+                yield {"event": "tool_call", "tool": tool_name}
+
+    # Handle tool responses (only parse JSON objects that can hold the key)
+    content = getattr(msg, "content", None)
+    if isinstance(content, str) and content.startswith("{") and '"success"' in content:
+        try:
+            content_data = _json_loads(content)
+        except (ValueError, TypeError):
+            return
+        if isinstance(content_data, dict) and "success" in content_data:
+            yield {
+                "event": "tool_response",
+                "success": content_data.get("success", False),
+                "error": content_data.get("error")
+                if not content_data.get("success")
+                else None,
+            }
+
+
+class ConversationLogger:
+    """Write the conversation log as JSON Lines while the agent runs.
+
+    Pass on_message to run_agent_async, then call finish() with the
+    statistics once the run is over.
+    """
+
+    def __init__(
+        self,
+        working_dir: Path,
+        task_basename: Optional[str] = None,
+        compress: bool = False,
+    ):
+        """Open the log file and write the start event.
+
+        Args:
+            working_dir: Directory to save log
+            task_basename: Base name for log file
+            compress: Write a gzip-compressed .jsonl.gz file
+        """
+        suffix = ".jsonl.gz" if compress else ".jsonl"
+        if task_basename:
+            self.path = working_dir / f"{task_basename}{suffix}"
+        else:
+            self.path = working_dir / f"log{suffix}"
+
+        # Close the file if the constructor fails; otherwise close() does
+        with contextlib.ExitStack() as stack:
+            if compress:
+                import gzip
+
+                # Fast compression level; log events are very repetitive
+                gzip_file = stack.enter_context(
+                    gzip.GzipFile(self.path, "wb", compresslevel=1)
+                )
+                self._file = stack.enter_context(io.BufferedWriter(gzip_file, 1 << 16))
+            else:
+                self._file = stack.enter_context(
+                    open(self.path, "wb", buffering=1 << 16)
+                )
+            self._last_todos: Optional[List[Dict[str, Any]]] = None
+            self._write({"event": "start", "task": task_basename or "inline"})
+            stack.pop_all()
+
+    def _write(self, event: Union[Dict[str, Any], bytes]):
+        if type(event) is not bytes:
+            event = _encode_event(event)
+        self._file.write(event)
+
+    def on_message(self, msg: Any):
+        """Log the tool calls and tool response of an agent message."""
+        for event in _message_events(msg):
+            if type(event) is dict and event["event"] == "todo":
+                # Repeated snapshots of the same list are logged by count only
+                if event["tasks"] == self._last_todos:
+                    event = {
+                        "event": "todo",
+                        "action": "unchanged",
+                        "count": event["count"],
+                    }
+                else:
+                    self._last_todos = event["tasks"]
+            self._write(event)
+
+    def flush(self):
+        """Write the buffered events to the file, e.g. after each turn."""
+        self._file.flush()
+
+    def finish(
+        self,
+        stats: Optional[Dict[str, Any]] = None,
+        reported_issues: Optional[List[Dict[str, Any]]] = None,
+    ):
+        """Write the closing events and close the file.
+
+        Args:
+            stats: Execution statistics
+            reported_issues: Issues from report_issue
+                (default: those of the current context)
+        """
+        # Statistics
+        if stats:
+            self._write(
+                {
+                    "event": "statistics",
+                    "tool_usage": stats.get("tool_usage", {}),
+                    "tokens": stats.get("token_consumption", {}),
+                    "execution_time": stats.get("execution_time_seconds", 0),
+                }
+            )
+
+        # Agent feedback
+        if reported_issues is None:
+            from agentic_python_coder.tools import get_reported_issues
+
+            reported_issues = get_reported_issues()
+        for issue in reported_issues:
+            self._write(
+                {
+                    "event": "agent_feedback",
+                    "content": issue.get("content", ""),
+                }
+            )
+
+        # Complete event
+        self._write(_COMPLETE_EVENTS[bool(reported_issues)])
+        self.close()
+
+    def close(self):
+        """Close the file; a log closed before finish() has no complete event."""
+        self._file.close()
+
+
 def save_conversation_log(
     working_dir: Path,
     messages: List[Any],
     stats: Optional[Dict[str, Any]] = None,
     task_basename: Optional[str] = None,
+    reported_issues: Optional[List[Dict[str, Any]]] = None,
+    compress: bool = False,
 ) -> Path:
     """Save conversation history as JSON Lines format.
 
+    Use ConversationLogger to write the log while the agent runs instead.
+
     Args:
         working_dir: Directory to save log
         messages: List of agent messages
         stats: Execution statistics
         task_basename: Base name for log file
+        reported_issues: Issues from report_issue
+            (default: those of the current context)
+        compress: Write a gzip-compressed .jsonl.gz file
 
     Returns:
         Path to saved log file
     """
-    if task_basename:
-        log_path = working_dir / f"{task_basename}.jsonl"
-    else:
-        log_path = working_dir / "log.jsonl"
-
-    with open(log_path, "w") as f:
-        # Start event
-        f.write(
-            json.dumps({"event": "start", "task": task_basename or "inline"}) + "\n"
-        )
-
-        # Process messages
+    log = ConversationLogger(working_dir, task_basename, compress)
+    try:
         for msg in messages:
-            if hasattr(msg, "tool_calls") and msg.tool_calls:
-                for tool_call in msg.tool_calls:
-                    if isinstance(tool_call, dict):
-                        tool_name = tool_call.get("name", "unknown")
-                        tool_args = tool_call.get("args", {})
-                    else:
-                        tool_name = getattr(tool_call, "name", "unknown")
-                        tool_args = getattr(tool_call, "args", {})
-
-                    if tool_name == "todo_write":
-                        todos = tool_args.get("todos", [])
-                        f.write(
-                            json.dumps(
-                                {
-                                    "event": "todo",
-                                    "action": "update",
-                                    "count": len(todos),
-                                    "tasks": [
-                                        {
-                                            "content": t.get("content", ""),
-                                            "status": t.get("status", ""),
-                                        }
-                                        for t in todos
-                                    ],
-                                }
-                            )
-                            + "\n"
-                        )
-                    elif tool_name == "python_exec":
-                        f.write(
-                            json.dumps(
-                                {
-                                    "event": "python_exec",
-                                    "code_length": len(tool_args.get("code", "")),
-                                }
-                            )
-                            + "\n"
-                        )
-                    elif tool_name == "save_code":
-                        f.write(
-                            json.dumps(
-                                {
-                                    "event": "save_code",
-                                    "code_length": len(tool_args.get("code", "")),
-                                }
-                            )
-                            + "\n"
-                        )
-                    elif tool_name == "report_issue":
-                        f.write(
-                            json.dumps(
-                                {
-                                    "event": "report_issue",
-                                    "issue": tool_args.get("text", "")[:200],
-                                }
-                            )
-                            + "\n"
-                        )
-                    else:
-                        f.write(
-                            json.dumps({"event": "tool_call", "tool": tool_name}) + "\n"
-                        )
-
-            # Handle tool responses
-            if hasattr(msg, "content") and isinstance(msg.content, str):
-                try:
-                    content_data = json.loads(msg.content)
-                    if "success" in content_data:
-                        f.write(
-                            json.dumps(
-                                {
-                                    "event": "tool_response",
-                                    "success": content_data.get("success", False),
-                                    "error": content_data.get("error")
-                                    if not content_data.get("success")
-                                    else None,
-                                }
-                            )
-                            + "\n"
-                        )
-                except (json.JSONDecodeError, TypeError):
-                    pass
-
-        # Statistics
-        if stats:
-            f.write(
-                json.dumps(
-                    {
-                        "event": "statistics",
-                        "tool_usage": stats.get("tool_usage", {}),
-                        "tokens": stats.get("token_consumption", {}),
-                        "execution_time": stats.get("execution_time_seconds", 0),
-                    }
-                )
-                + "\n"
-            )
-
-        # Agent feedback
-        reported_issues = get_reported_issues()
-        if reported_issues:
-            for issue in reported_issues:
-                f.write(
-                    json.dumps(
-                        {
-                            "event": "agent_feedback",
-                            "content": issue.get("content", ""),
-                        }
-                    )
-                    + "\n"
-                )
-
-        # Complete event
-        f.write(
-            json.dumps(
-                {
-                    "event": "complete",
-                    "status": "success"
-                    if not reported_issues
-                    else "success_with_issues",
-                }
-            )
-            + "\n"
-        )
-
-    return log_path
+            log.on_message(msg)
+    except BaseException:
+        log.close()
+        raise
+    log.finish(stats, reported_issues)
+    return log.path
 
 
 def solve_task(
@@ -206,10 +338,14 @@ def solve_task(
     save_log: bool = True,
     task_basename: Optional[str] = None,
     step_limit: Optional[int] = None,
+    max_history_tokens: Optional[int] = None,
+    compress_log: bool = False,
 ) -> tuple[List[Any], Dict[str, Any], Optional[Path]]:
     """Run a complete coding task end-to-end.
 
-    This is the main library entry point for running coding tasks.
+    This is the main library entry point for running coding tasks. It is a
+    synchronous wrapper around solve_task_async; called from a running event
+    loop, it blocks that loop until the task is done (see run_sync).
 
     Args:
         task: The task description/instructions
@@ -225,6 +361,9 @@ def solve_task(
         save_log: Save conversation log to file (default: True)
         task_basename: Base name for output files
         step_limit: Maximum agent steps before stopping (default: 200)
+        max_history_tokens: Approximate token budget for the history sent to
+            the LLM (default: send the full history)
+        compress_log: Save the log gzip-compressed as .jsonl.gz
 
     Returns:
         Tuple of (messages, stats, log_path)
@@ -240,16 +379,61 @@ def solve_task(
         ...     quiet=True,
         ... )
     """
+    return run_sync(
+        solve_task_async(
+            task,
+            working_directory=working_directory,
+            model=model,
+            system_prompt=system_prompt,
+            system_prompt_path=system_prompt_path,
+            project_prompt=project_prompt,
+            with_packages=with_packages,
+            api_key=api_key,
+            todo=todo,
+            quiet=quiet,
+            save_log=save_log,
+            task_basename=task_basename,
+            step_limit=step_limit,
+            max_history_tokens=max_history_tokens,
+            compress_log=compress_log,
+        )
+    )
+
+
+async def solve_task_async(
+    task: str,
+    working_directory: str = ".",
+    model: Optional[str] = None,
+    system_prompt: Optional[str] = None,
+    system_prompt_path: Optional[str] = None,
+    project_prompt: Optional[str] = None,
+    with_packages: Optional[List[str]] = None,
+    api_key: Optional[str] = None,
+    todo: bool = False,
+    quiet: bool = False,
+    save_log: bool = True,
+    task_basename: Optional[str] = None,
+    step_limit: Optional[int] = None,
+    max_history_tokens: Optional[int] = None,
+    compress_log: bool = False,
+) -> tuple[List[Any], Dict[str, Any], Optional[Path]]:
+    """Async variant of solve_task; takes the same arguments."""
+    from agentic_python_coder.agent import (
+        create_coding_agent,
+        load_prompt,
+        run_agent_async,
+    )
+    from agentic_python_coder.tools import get_reported_issues
+
     working_dir = Path(working_directory).resolve()
     working_dir.mkdir(parents=True, exist_ok=True)
 
     # Load system prompt: string > path > default
     if system_prompt is None:
         if system_prompt_path is not None:
-            system_prompt = Path(system_prompt_path).read_text()
+            system_prompt = load_prompt(Path(system_prompt_path))
         else:
-            default_path = get_system_prompt_path(todo)
-            system_prompt = default_path.read_text()
+            system_prompt = load_prompt(get_system_prompt_path(todo))
 
     # Create agent
     agent = create_coding_agent(
@@ -263,15 +447,115 @@ def solve_task(
         api_key=api_key,
         todo=todo,
         verbose=not quiet,
+        max_history_tokens=max_history_tokens,
     )
 
-    # Run agent
+    # Run agent, writing the log as messages arrive
+    log = (
+        ConversationLogger(working_dir, task_basename, compress_log)
+        if save_log
+        else None
+    )
     message = "Please complete the task described in the instructions."
-    messages, stats = run_agent(agent, message, quiet=quiet, step_limit=step_limit)
+    try:
+        messages, stats = await run_agent_async(
+            agent,
+            message,
+            quiet=quiet,
+            step_limit=step_limit,
+            on_message=log.on_message if log else None,
+        )
+    except BaseException:
+        if log:
+            log.close()
+        raise
 
-    # Save log
     log_path = None
-    if save_log:
-        log_path = save_conversation_log(working_dir, messages, stats, task_basename)
+    if log:
+        log.finish(stats, get_reported_issues())
+        log_path = log.path
 
     return messages, stats, log_path
+
+
+async def solve_tasks_async(
+    tasks: List[str],
+    task_basenames: Optional[List[str]] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    **kwargs,
+) -> List[Any]:
+    """Run independent coding tasks concurrently.
+
+    Each task gets its own agent, tool state and Python kernel; at most
+    `concurrency` tasks run at the same time. Output files are named after
+    the task basenames, so tasks sharing a working directory do not clash.
+
+    Args:
+        tasks: The task descriptions
+        task_basenames: Distinct base names for output files
+            (default: task_1, task_2, ...)
+        concurrency: Maximum number of tasks running at once (default: 8)
+        **kwargs: Passed to solve_task_async for every task
+
+    Returns:
+        One (messages, stats, log_path) tuple per task, in input order. A
+        task that failed yields its exception instead.
+
+    Raises:
+        ValueError: If the basenames are not distinct or do not match the
+            tasks, or if concurrency is less than 1
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    if task_basenames is None:
+        task_basenames = [f"task_{i}" for i in range(1, len(tasks) + 1)]
+    if len(task_basenames) != len(tasks):
+        raise ValueError("Need exactly one basename per task")
+    if len(set(task_basenames)) != len(task_basenames):
+        raise ValueError("Task basenames must be distinct")
+
+    from agentic_python_coder.kernel import shutdown_kernel
+    from agentic_python_coder.tools import set_kernel_session
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(task: str, basename: str):
+        # Runs as its own asyncio task, so the tool state set here is private
+        async with semaphore:
+            set_kernel_session(basename)
+            try:
+                return await solve_task_async(task, task_basename=basename, **kwargs)
+            finally:
+                await asyncio.to_thread(shutdown_kernel, basename)
+
+    return await asyncio.gather(
+        *(run_one(task, name) for task, name in zip(tasks, task_basenames)),
+        return_exceptions=True,
+    )
+
+
+def solve_tasks(
+    tasks: List[str],
+    task_basenames: Optional[List[str]] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    **kwargs,
+) -> List[Any]:
+    """Run independent coding tasks concurrently.
+
+    Synchronous wrapper around solve_tasks_async (see there for details and
+    run_sync for use inside an event loop).
+
+    Example:
+        >>> from agentic_python_coder import solve_tasks
+        >>> results = solve_tasks(
+        ...     ["Write a fibonacci function", "Write a prime sieve"],
+        ...     task_basenames=["fib", "sieve"],
+        ...     working_directory="/tmp/workspace",
+        ...     quiet=True,
+        ... )
+    """
+    return run_sync(
+        solve_tasks_async(
+            tasks, task_basenames=task_basenames, concurrency=concurrency, **kwargs
+        )
+    )
@@ -1,76 +1,76 @@
 """Tools for the Python coding agent."""
 
-import json
+import asyncio
+import weakref
+from contextvars import ContextVar
 from pathlib import Path
-from typing import List, Dict, Any
-from langchain_core.tools import tool
+from typing import List, Dict, Any, Optional
+from langchain_core.tools import StructuredTool, tool
 
-from .kernel import get_kernel, format_output
+from .kernel import _dumps, get_kernel, format_output
 
+# Per-run tool state lives in context variables so that agents running
+# concurrently (see runner.solve_tasks) do not see each other's state.
+# Tools are executed with a copy of the calling context.
 
-class WorkingDirectory:
-    """Manages the working directory for all file operations."""
 
-    _instance = None
-    _working_dir = None
+_working_dir: ContextVar[Optional[Path]] = ContextVar("coder_working_dir", default=None)
+
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+class WorkingDirectory:
+    """Manages the working directory for all file operations."""
 
     def set(self, path: str):
         """Set the working directory."""
-        self._working_dir = Path(path).resolve()
-        if not self._working_dir.exists():
+        resolved = Path(path).resolve()
+        if not resolved.exists():
             raise ValueError(f"Directory does not exist: {path}")
+        _working_dir.set(resolved)
 
     def get(self) -> Path:
         """Get the working directory."""
-        if self._working_dir is None:
+        working_dir = _working_dir.get()
+        if working_dir is None:
             raise RuntimeError("Working directory not set")
-        return self._working_dir
+        return working_dir
 
-    def resolve_path(self, file_path: str) -> Path:
-        """Resolve a path relative to the working directory."""
-        path = Path(file_path)
-        if path.is_absolute():
-            raise ValueError("Absolute paths not allowed")
 
-        full_path = (self.get() / path).resolve()
-
-        # Security check: ensure path is within working directory
-        try:
-            full_path.relative_to(self.get())
-        except ValueError:
-            raise ValueError(f"Path {file_path} is outside working directory")
+# The only instance; its state is the context variable above
+working_dir = WorkingDirectory()
 
-        return full_path
 
+def _context_list(var: ContextVar) -> list:
+    """Get the list held by a context variable, giving the context its own if unset.
 
-# Global working directory instance
-working_dir = WorkingDirectory()
+    A list default would be shared by every context in which the variable
+    was never set, and the tools mutate these lists in place.
+    """
+    value = var.get()
+    if value is None:
+        value = []
+        var.set(value)
+    return value
 
 
 # Helper functions for consistent JSON responses
 def success_response(result: Any = None, **kwargs) -> str:
     """Create a success JSON response."""
-    response = {"success": True}
-    if result is not None:
-        response["result"] = result
-    response.update(kwargs)
-    return json.dumps(response, indent=2)
+    if result is None:
+        return _dumps({"success": True, **kwargs})
+    return _dumps({"success": True, "result": result, **kwargs})
 
 
 def error_response(error: str, **kwargs) -> str:
     """Create an error JSON response."""
-    response = {"success": False, "error": error}
-    response.update(kwargs)
-    return json.dumps(response, indent=2)
+    return _dumps({"success": False, "error": error, **kwargs})
 
 
 # Todo management tools
-_todos = []
+_todos: ContextVar[Optional[list]] = ContextVar("coder_todos", default=None)
+
+_TODO_KEYS = frozenset(("id", "content", "status", "priority"))
+_TODO_STATUSES = ("pending", "in_progress", "completed")
+_TODO_PRIORITIES = ("high", "medium", "low")
 
 
 @tool
@@ -91,31 +91,59 @@ def todo_write(todos: List[Dict[str, Any]]) -> str:
     """
     try:
         # Validate only one in_progress
-        in_progress = sum(1 for t in todos if t.get("status") == "in_progress")
-        if in_progress > 1:
+        statuses = [t.get("status") for t in todos]
+        if statuses.count("in_progress") > 1:
             return error_response("Only one task can be in_progress at a time")
 
         # Basic validation of required fields
         for todo in todos:
-            if not all(key in todo for key in ["id", "content", "status", "priority"]):
+            if not _TODO_KEYS.issubset(todo):
                 return error_response(
                     "Each todo must have id, content, status, and priority"
                 )
-            if todo["status"] not in ["pending", "in_progress", "completed"]:
+            if todo["status"] not in _TODO_STATUSES:
                 return error_response(f"Invalid status: {todo['status']}")
-            if todo["priority"] not in ["high", "medium", "low"]:
+            if todo["priority"] not in _TODO_PRIORITIES:
                 return error_response(f"Invalid priority: {todo['priority']}")
 
-        global _todos
-        _todos = todos
+        # Replace in place: the tool runs in a copy of the agent's context
+        _context_list(_todos)[:] = todos
         return success_response(f"Updated {len(todos)} todos", count=len(todos))
     except Exception as e:
         return error_response(f"Error updating todos: {str(e)}")
 
 
 # Python execution tool
-@tool
-def python_exec(code: str) -> str:
+_kernel_session: ContextVar[Optional[str]] = ContextVar(
+    "coder_kernel_session", default=None
+)
+
+
+_with_packages: ContextVar[Optional[List[str]]] = ContextVar(
+    "coder_with_packages", default=None
+)
+
+
+def set_kernel_session(session: Optional[str]):
+    """Select the kernel used by python_exec in the current context.
+
+    Each session name gets its own kernel; None selects the shared default.
+    """
+    _kernel_session.set(session)
+
+
+def set_with_packages(packages: Optional[List[str]]):
+    """Set the packages of python_exec's kernel (None: no dynamic packages)."""
+    _with_packages.set(packages)
+
+
+_UV_MISSING_RESPONSE = error_response(
+    "UV is not installed. To use dynamic package mode, install UV with:\n"
+    "curl -LsSf https://astral.sh/uv/install.sh | sh"
+)
+
+
+def _python_exec(code: str) -> str:
     """Execute Python code in a persistent IPython kernel.
 
     IMPORTANT: The kernel maintains state between executions!
@@ -144,17 +172,13 @@ def python_exec(code: str) -> str:
         - stderr: warnings (if any)
         - error: error message (if execution failed)
     """
-    # Check if we're in dynamic package mode
-    import os
-
-    with_packages = None
-    if "CODER_WITH_PACKAGES" in os.environ:
-        packages_str = os.environ["CODER_WITH_PACKAGES"]
-        with_packages = packages_str.split(",") if packages_str else []
-
     try:
         # Get the persistent kernel with the working directory
-        kernel = get_kernel(cwd=str(working_dir.get()), with_packages=with_packages)
+        kernel = get_kernel(
+            cwd=str(working_dir.get()),
+            with_packages=_with_packages.get(),
+            session=_kernel_session.get(),
+        )
 
         # Execute the user's code
         output = kernel.execute(code)
@@ -166,10 +190,7 @@ def python_exec(code: str) -> str:
         # Kernel startup failed - return user-friendly error
         error_msg = str(e)
         if "UV is required" in error_msg:
-            return error_response(
-                "UV is not installed. To use dynamic package mode, install UV with:\n"
-                "curl -LsSf https://astral.sh/uv/install.sh | sh"
-            )
+            return _UV_MISSING_RESPONSE
         elif "Failed to start kernel" in error_msg:
             return error_response(f"Failed to start Python kernel: {error_msg}")
         else:
@@ -180,14 +201,38 @@ def python_exec(code: str) -> str:
         return error_response(f"Unexpected error executing code: {str(e)}")
 
 
+# Locks of each event loop and kernel session. The calls of one agent step
+# start in order, so waiting on the lock runs them in that order, while the
+# other tools of the step run concurrently.
+_exec_locks: "weakref.WeakKeyDictionary[Any, Dict[Optional[str], asyncio.Lock]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def _python_exec_async(code: str) -> str:
+    """Run python_exec in a worker thread, after earlier calls of the session."""
+    locks = _exec_locks.setdefault(asyncio.get_running_loop(), {})
+    session = _kernel_session.get()
+    if session not in locks:
+        locks[session] = asyncio.Lock()
+    async with locks[session]:
+        return await asyncio.to_thread(_python_exec, code)
+
+
+python_exec = StructuredTool.from_function(
+    func=_python_exec, coroutine=_python_exec_async, name="python_exec"
+)
+
+
 # Fileless mode tools
-_task_basename = None
+_task_basename: ContextVar[Optional[str]] = ContextVar(
+    "coder_task_basename", default=None
+)
 
 
 def set_task_basename(basename: str):
     """Set the basename for file naming in fileless mode."""
-    global _task_basename
-    _task_basename = basename
+    _task_basename.set(basename)
 
 
 @tool
@@ -204,24 +249,29 @@ def save_code(code: str) -> str:
         JSON with success status and file path
     """
     try:
-        global _task_basename
-
         # Determine output filename
-        if _task_basename:
-            filename = f"{_task_basename}_code.py"
+        task_basename = _task_basename.get()
+        if task_basename:
+            filename = f"{task_basename}_code.py"
         else:
             filename = "solution.py"
 
         # Save to working directory
         output_path = working_dir.get() / filename
-        output_path.write_text(code)
+        output_path.write_text(code, encoding="utf-8")
 
         return success_response(f"Code saved to {filename}", file_path=str(filename))
     except Exception as e:
         return error_response(f"Error saving code: {str(e)}")
 
 
-_reported_issues = []
+_reported_issues: ContextVar[Optional[list]] = ContextVar(
+    "coder_reported_issues", default=None
+)
+
+_ISSUE_REPORTED_RESPONSE = success_response(
+    "Issue reported and will be included in the log", reported=True
+)
 
 
 @tool
@@ -245,30 +295,26 @@ def report_issue(text: str) -> str:
         JSON with success status
     """
     try:
-        global _reported_issues
-
         # Store the issue in memory to be included when log is saved
-        _reported_issues.append({"type": "agent_feedback", "content": text})
-
-        return success_response(
-            "Issue reported and will be included in the log", reported=True
+        _context_list(_reported_issues).append(
+            {"type": "agent_feedback", "content": text}
         )
+
+        return _ISSUE_REPORTED_RESPONSE
     except Exception as e:
         return error_response(f"Error reporting issue: {str(e)}")
 
 
 def get_reported_issues():
     """Get all reported issues for inclusion in the log."""
-    global _reported_issues
-    return _reported_issues
+    return _context_list(_reported_issues)
 
 
 def reset_global_state():
-    """Reset all global state to avoid accumulation across runs.
+    """Reset all tool state in the current context to avoid accumulation across runs.
 
     Called by create_coding_agent() to ensure clean state for each new agent.
     """
-    global _todos, _task_basename, _reported_issues
-    _todos = []
-    _task_basename = None
-    _reported_issues = []
+    _todos.set([])
+    _task_basename.set(None)
+    _reported_issues.set([])
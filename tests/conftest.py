@@ -0,0 +1,61 @@
+"""Shared fixtures: a scripted chat model in place of OpenRouter."""
+
+import asyncio
+from typing import Callable
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import agentic_python_coder.agent as agent_module
+
+
+class ScriptedModel(BaseChatModel):
+    """Chat model answering each request with reply(messages)."""
+
+    reply: Callable[[list], AIMessage]
+    model_name: str = "test/scripted"
+    delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self.reply(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        ScriptedModel.active += 1
+        ScriptedModel.max_active = max(ScriptedModel.max_active, ScriptedModel.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            ScriptedModel.active -= 1
+        return self._generate(messages)
+
+
+# Requests in flight, across all instances (see _agenerate)
+ScriptedModel.active = 0
+ScriptedModel.max_active = 0
+
+
+@pytest.fixture
+def scripted_llm(monkeypatch):
+    """Make agents use ScriptedModel(reply=..., **options) instead of OpenRouter."""
+
+    def install(reply: Callable[[list], AIMessage], **options) -> type:
+        monkeypatch.setattr(
+            agent_module,
+            "get_openrouter_llm",
+            lambda **kwargs: ScriptedModel(reply=reply, **options),
+        )
+        agent_module._compile_agent.cache_clear()
+        ScriptedModel.active = ScriptedModel.max_active = 0
+        return ScriptedModel
+
+    yield install
+    agent_module._compile_agent.cache_clear()
@@ -0,0 +1,82 @@
+"""Tests for the agent's history trimming."""
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agentic_python_coder.agent import _trim_history
+
+
+def _call(call_id: str, code: str) -> AIMessage:
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": "python_exec", "args": {"code": code}, "id": call_id}],
+    )
+
+
+def test_history_within_budget_is_unchanged():
+    messages = [HumanMessage("task"), AIMessage("done")]
+    assert _trim_history(messages, 10_000) is messages
+
+
+def test_single_message_over_budget_is_sent_once():
+    messages = [HumanMessage("x" * 4000)]
+    assert _trim_history(messages, 10) == messages
+
+
+def test_newest_user_message_is_kept():
+    messages = [
+        HumanMessage("task"),
+        _call("1", "x" * 4000),
+        ToolMessage("ok", tool_call_id="1"),
+        HumanMessage("now fix the bug please"),
+    ]
+    assert _trim_history(messages, 200) == [messages[0], messages[3]]
+
+
+def test_newest_tool_call_is_kept_with_its_results():
+    messages = [
+        HumanMessage("task"),
+        _call("1", "print(1)"),
+        ToolMessage("1", tool_call_id="1"),
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "python_exec", "args": {"code": "x" * 4000}, "id": "2"},
+                {"name": "save_code", "args": {"code": "y"}, "id": "3"},
+            ],
+        ),
+        ToolMessage("ok", tool_call_id="2"),
+        ToolMessage("saved", tool_call_id="3"),
+    ]
+    assert _trim_history(messages, 200) == [messages[0], *messages[3:]]
+
+
+def test_tail_never_starts_with_a_tool_result():
+    messages = [HumanMessage("task")]
+    for i in range(20):
+        messages += [_call(str(i), "x" * 200), ToolMessage("ok", tool_call_id=str(i))]
+    trimmed = _trim_history(messages, 500)
+    assert trimmed[0] is messages[0]
+    assert isinstance(trimmed[1], AIMessage)
+    assert len(trimmed) < len(messages)
+    assert trimmed[-1] is messages[-1]
+
+
+def test_checkpointer_keeps_only_the_latest_checkpoint(scripted_llm, tmp_path):
+    from agentic_python_coder.agent import create_coding_agent, run_agent
+
+    seen = []
+
+    def reply(messages):
+        seen.append(len(messages))
+        return AIMessage("ok")
+
+    scripted_llm(reply)
+    agent = create_coding_agent(working_directory=str(tmp_path))
+    for text in ["a", "b", "c"]:
+        run_agent(agent, text, quiet=True)
+
+    saver = agent.checkpointer
+    assert [len(c) for c in saver.storage["default"].values()] == [1]
+    assert not saver.writes
+    # The conversation continues from the pruned checkpoint (system + history)
+    assert seen == [2, 4, 6]
@@ -0,0 +1,111 @@
+"""Tests for the on-disk LLM response cache."""
+
+import os
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from agentic_python_coder.cache import DiskLLMCache
+
+
+def _response(text: str) -> list:
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def _text(generations) -> str:
+    return generations[0].message.content
+
+
+def test_lookup_returns_the_stored_response(tmp_path):
+    cache = DiskLLMCache(cache_dir=tmp_path)
+    assert cache.lookup("prompt", "llm") is None
+    cache.update("prompt", "llm", _response("answer"))
+    assert _text(cache.lookup("prompt", "llm")) == "answer"
+    assert cache.lookup("other prompt", "llm") is None
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = DiskLLMCache(cache_dir=tmp_path, ttl=60)
+    cache.update("prompt", "llm", _response("answer"))
+    (path,) = tmp_path.glob("*.json")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert cache.lookup("prompt", "llm") is None
+
+
+def test_failed_write_is_ignored(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = DiskLLMCache(cache_dir=blocker / "cache")
+    cache.update("prompt", "llm", _response("answer"))
+    assert cache.lookup("prompt", "llm") is None
+
+
+def _update_concurrently(cache: DiskLLMCache, count: int) -> list:
+    errors = []
+
+    def update(i):
+        try:
+            cache.update("prompt", "llm", _response(str(i)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_updates_of_one_key(tmp_path):
+    cache = DiskLLMCache(cache_dir=tmp_path)
+    assert _update_concurrently(cache, 16) == []
+    assert _text(cache.lookup("prompt", "llm")) in {str(i) for i in range(16)}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_sampled_mode_replays_one_sample_per_request(tmp_path):
+    first = DiskLLMCache(cache_dir=tmp_path, sampled=True)
+    for text in ["one", "two"]:
+        assert first.lookup("prompt", "llm") is None
+        first.update("prompt", "llm", _response(text))
+
+    # A later run gets the stored samples in order, then misses
+    second = DiskLLMCache(cache_dir=tmp_path, sampled=True)
+    assert _text(second.lookup("prompt", "llm")) == "one"
+    assert _text(second.lookup("prompt", "llm")) == "two"
+    assert second.lookup("prompt", "llm") is None
+
+
+def test_sampled_mode_keeps_concurrent_samples(tmp_path):
+    cache = DiskLLMCache(cache_dir=tmp_path, sampled=True)
+    assert _update_concurrently(cache, 16) == []
+    replay = DiskLLMCache(cache_dir=tmp_path, sampled=True)
+    samples = {_text(replay.lookup("prompt", "llm")) for _ in range(16)}
+    assert samples == {str(i) for i in range(16)}
+
+
+def test_sampled_mode_reuses_expired_slots(tmp_path):
+    cache = DiskLLMCache(cache_dir=tmp_path, sampled=True, ttl=60)
+    cache.update("prompt", "llm", _response("old"))
+    (path,) = tmp_path.glob("*.samples.json")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    cache.update("prompt", "llm", _response("new"))
+    assert list(tmp_path.glob("*.samples.json")) == [path]
+    replay = DiskLLMCache(cache_dir=tmp_path, sampled=True, ttl=60)
+    assert _text(replay.lookup("prompt", "llm")) == "new"
+
+
+def test_clear_removes_entries_and_draws(tmp_path):
+    cache = DiskLLMCache(cache_dir=tmp_path, sampled=True)
+    cache.update("prompt", "llm", _response("one"))
+    assert cache.lookup("prompt", "llm") is not None
+    cache.clear()
+    assert not list(tmp_path.iterdir())
+    cache.update("prompt", "llm", _response("two"))
+    assert _text(cache.lookup("prompt", "llm")) == "two"
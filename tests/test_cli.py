@@ -0,0 +1,96 @@
+"""Tests for the command line parsing and batch loading."""
+
+import json
+import sys
+
+import pytest
+
+from agentic_python_coder.cli import load_batch, parse_args
+
+
+def _write_batch(path, lines):
+    path.write_text("".join(f"{line}\n" for line in lines))
+    return path
+
+
+def test_load_batch_names_tasks_after_their_lines(tmp_path):
+    batch = _write_batch(
+        tmp_path / "tasks.jsonl",
+        [
+            json.dumps({"task": "first"}),
+            "",
+            json.dumps({"task": "second", "basename": "named"}),
+            json.dumps({"task": "third"}),
+        ],
+    )
+    assert load_batch(batch) == (
+        ["first", "second", "third"],
+        ["task_1", "named", "task_4"],
+    )
+
+
+@pytest.mark.parametrize(
+    "lines, error",
+    [
+        (
+            [
+                json.dumps({"task": "a"}),
+                json.dumps({"task": "b", "basename": "task_1"}),
+            ],
+            "line 2: basename 'task_1' is already used on line 1",
+        ),
+        (
+            [
+                json.dumps({"task": "a", "basename": "x"}),
+                json.dumps({"task": "b", "basename": "x"}),
+            ],
+            "line 2: basename 'x' is already used on line 1",
+        ),
+        (
+            [json.dumps({"task": "a"}), '"just a string"'],
+            "line 2: expected a JSON object",
+        ),
+        (["[1, 2]"], "line 1: expected a JSON object"),
+        (["{not json"], "Error loading batch file"),
+        ([json.dumps({"basename": "x"})], "'task'"),
+    ],
+)
+def test_load_batch_reports_invalid_lines(tmp_path, capsys, lines, error):
+    batch = _write_batch(tmp_path / "tasks.jsonl", lines)
+    with pytest.raises(SystemExit) as exit_info:
+        load_batch(batch)
+    assert exit_info.value.code == 1
+    output = capsys.readouterr().out
+    assert output.startswith("Error loading batch file:")
+    assert error in output
+    assert len(output.splitlines()) == 1
+
+
+def _parse(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["coder", *argv])
+    return parse_args()
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "many"])
+def test_max_concurrency_must_be_positive(monkeypatch, capsys, value):
+    with pytest.raises(SystemExit):
+        _parse(monkeypatch, "--batch", "tasks.jsonl", "--max-concurrency", value)
+    assert "--max-concurrency" in capsys.readouterr().err
+
+
+def test_max_concurrency_default(monkeypatch):
+    assert _parse(monkeypatch, "--batch", "tasks.jsonl").max_concurrency == 8
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--batch", "tasks.jsonl", "--task", "task.md"],
+        ["--batch", "tasks.jsonl", "--tasks-dir", "tasks"],
+        ["--task", "task.md", "--tasks-dir", "tasks"],
+    ],
+)
+def test_task_sources_are_exclusive(monkeypatch, capsys, argv):
+    with pytest.raises(SystemExit):
+        _parse(monkeypatch, *argv)
+    assert "not allowed with argument" in capsys.readouterr().err
@@ -0,0 +1,39 @@
+"""Tests for the kernel helpers that do not need a running kernel."""
+
+from agentic_python_coder.kernel import PythonKernel, _package_key
+
+
+class _RecordingKernel(PythonKernel):
+    """PythonKernel that records executed code instead of starting a kernel."""
+
+    def __init__(self, with_packages, error=None):
+        self.with_packages = list(with_packages)
+        self.package_key = _package_key(self.with_packages)
+        self.uses_uv = bool(with_packages)
+        self.executed = []
+        self._error = error
+
+    def execute(self, code, poll_timeout=None):
+        self.executed.append(code)
+        return {"stdout": "", "stderr": "", "result": None, "error": self._error}
+
+
+def test_install_packages_restarts_kernels_on_the_host_interpreter():
+    kernel = _RecordingKernel([])
+    assert not kernel.install_packages(["pandas"])
+    assert kernel.executed == []
+
+
+def test_install_packages_adds_to_a_uv_kernel():
+    kernel = _RecordingKernel(["numpy"])
+    assert kernel.install_packages(["pandas"])
+    assert "'pip', 'install'" in kernel.executed[0]
+    assert "pandas" in kernel.executed[0]
+    assert kernel.with_packages == ["numpy", "pandas"]
+    assert kernel.package_key == ("numpy", "pandas")
+
+
+def test_failed_installation_keeps_the_package_list():
+    kernel = _RecordingKernel(["numpy"], error="CalledProcessError")
+    assert not kernel.install_packages(["pandas"])
+    assert kernel.with_packages == ["numpy"]
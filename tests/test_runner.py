@@ -0,0 +1,80 @@
+"""Tests for the high-level task runners."""
+
+import asyncio
+import re
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agentic_python_coder.runner import run_sync, solve_tasks, solve_tasks_async
+
+
+def _save_task_reply(messages):
+    """Save code printing the task text, then finish."""
+    if not any(isinstance(m, ToolMessage) for m in messages):
+        task = re.search(r"<task>\n(.*)\n</task>", messages[1].content).group(1)
+        return AIMessage(
+            "",
+            tool_calls=[
+                {"name": "save_code", "args": {"code": f"print({task!r})"}, "id": "1"}
+            ],
+        )
+    return AIMessage("done")
+
+
+def test_solve_tasks_runs_tasks_concurrently(scripted_llm, tmp_path):
+    model = scripted_llm(_save_task_reply, delay=0.1)
+    results = solve_tasks(
+        ["one", "two", "three", "four"],
+        task_basenames=["a", "b", "c", "d"],
+        concurrency=2,
+        working_directory=str(tmp_path),
+        quiet=True,
+    )
+
+    assert model.max_active == 2
+    for (messages, stats, log_path), name, task in zip(
+        results, "abcd", ["one", "two", "three", "four"]
+    ):
+        assert messages[-1].content == "done"
+        assert stats["tool_usage"] == {"save_code": 1}
+        assert log_path == tmp_path / f"{name}.jsonl"
+        assert (tmp_path / f"{name}_code.py").read_text() == f"print({task!r})"
+
+
+def test_solve_tasks_returns_exceptions_in_place(scripted_llm, tmp_path):
+    def reply(messages):
+        if "<task>\nbad\n" in messages[1].content:
+            raise RuntimeError("provider error")
+        return AIMessage("done")
+
+    scripted_llm(reply)
+    ok, failed = solve_tasks(
+        ["good", "bad"], working_directory=str(tmp_path), quiet=True, save_log=False
+    )
+    assert ok[0][-1].content == "done"
+    assert isinstance(failed, RuntimeError) and str(failed) == "provider error"
+
+
+@pytest.mark.parametrize(
+    "tasks, options, message",
+    [
+        (["a", "b"], {"task_basenames": ["x", "x"]}, "distinct"),
+        (["a", "b"], {"task_basenames": ["x"]}, "one basename per task"),
+        (["a"], {"concurrency": 0}, "at least 1"),
+    ],
+)
+def test_solve_tasks_rejects_invalid_arguments(tasks, options, message):
+    with pytest.raises(ValueError, match=message):
+        asyncio.run(solve_tasks_async(tasks, **options))
+
+
+def test_run_sync_inside_a_running_loop():
+    async def value():
+        return 42
+
+    async def caller():
+        return run_sync(value())
+
+    assert run_sync(value()) == 42
+    assert asyncio.run(caller()) == 42